@@ -91,6 +91,7 @@ EVENT_CUSTOM_FIELDS = [
         "fieldtype": "Link",
         "options": "Outlook Event Slot",
         "fieldname": "custom_outlook_from_slot",
+        "search_index": 1,
     },
     {
         "doctype": "Custom Field",
@@ -0,0 +1,25 @@
+# Graph ids are stored in Small Text columns, which only take prefix indexes
+GRAPH_ID_PREFIX_LENGTH = 255
+
+DB_INDEXES = [
+    {
+        "doctype": "Event",
+        "fields": [f"custom_outlook_event_id({GRAPH_ID_PREFIX_LENGTH})"],
+        "index_name": "custom_outlook_event_id_index",
+    },
+    {
+        "doctype": "Outlook Calendar",
+        "fields": [f"id({GRAPH_ID_PREFIX_LENGTH})"],
+        "index_name": "id_index",
+    },
+    {
+        "doctype": "Outlook Calendar Group",
+        "fields": [f"id({GRAPH_ID_PREFIX_LENGTH})"],
+        "index_name": "id_index",
+    },
+    {
+        "doctype": "Event Participants",
+        "fields": ["reference_doctype", "reference_docname", "parenttype"],
+        "index_name": "reference_doctype_reference_docname_parenttype_index",
+    },
+]
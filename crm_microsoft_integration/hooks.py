@@ -149,6 +149,20 @@ doc_events = {
 # Scheduled Tasks
 # ---------------
 
+scheduler_events = {
+    "cron": {
+        "* * * * *": [
+            "crm_microsoft_integration.microsoft.customizations.event.enqueue_outlook_outbox"
+        ],
+    },
+    "hourly": [
+        "crm_microsoft_integration.microsoft.doctype.outlook_calendar.outlook_calendar.sync_outlook_subscriptions"
+    ],
+    "daily": [
+        "crm_microsoft_integration.microsoft.customizations.event.clear_outlook_outbox"
+    ],
+}
+
 # scheduler_events = {
 # 	"all": [
 # 		"crm_microsoft_integration.tasks.all"
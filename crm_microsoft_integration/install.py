@@ -1,9 +1,10 @@
 import frappe
-from crm_microsoft_integration.config import custom_fields
+from crm_microsoft_integration.config import custom_fields, indexes
 
 
 def after_install():
     add_custom_fields()
+    add_indexes()
 
     frappe.db.commit()
 
@@ -23,3 +24,8 @@ def add_custom_fields():
             {"dt": custom_field["dt"], "fieldname": custom_field["fieldname"]},
         ):
             frappe.get_doc(custom_field).save()
+
+
+def add_indexes():
+    for index in indexes.DB_INDEXES:
+        frappe.db.add_index(index["doctype"], index["fields"], index["index_name"])
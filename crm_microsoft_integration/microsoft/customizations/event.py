@@ -1,10 +1,36 @@
+from collections import Counter
+import hmac
+import time
 import frappe
 from frappe import _, utils
+from frappe.model.naming import parse_naming_series, set_new_name
+from requests.exceptions import HTTPError
+from werkzeug.wrappers import Response
+from crm_microsoft_integration.microsoft import sync
 from crm_microsoft_integration.microsoft.integration.event import event
+from crm_microsoft_integration.microsoft.integration.event import (
+    utils as event_utils,
+)
+from crm_microsoft_integration.microsoft.doctype.microsoft_settings import (
+    microsoft_settings as mi_settings,
+)
 
 SYNC_OUTLOOK_EVENT_TIMEOUT = 25 * 60
 SYNC_OUTLOOK_EVENT_JOB_NAME = "sync_outlook_events"
 SYNC_OUTLOOK_EVENT_PROGRESS_ID = "sync_outlook_events_progress"
+SYNC_OUTLOOK_EVENT_FULL_SYNC_JOB_NAME = "sync_outlook_events_full_sync"
+# Delta tokens are started over once the rolling sync window has moved this far
+SYNC_OUTLOOK_DELTA_WINDOW_DRIFT_DAYS = 7
+OUTLOOK_NOTIFICATION_TIMEOUT = 5 * 60
+OUTLOOK_OUTBOX_TIMEOUT = 25 * 60
+OUTLOOK_OUTBOX_JOB_ID = "process_outlook_outbox"
+OUTLOOK_OUTBOX_BATCH_SIZE = 100
+OUTLOOK_OUTBOX_MAX_ATTEMPTS = 8
+OUTLOOK_OUTBOX_RETRY_SECONDS = 30
+OUTLOOK_OUTBOX_RETRY_MAX_SECONDS = 60 * 60
+OUTLOOK_OUTBOX_KEEP_DAYS = 7
+OUTLOOK_OUTBOX_COALESCE_SECONDS = 5
+OUTLOOK_OUTBOX_CLAIM_SECONDS = 10 * 60
 
 WEEK_FIELDS = [
     "monday",
@@ -25,26 +51,8 @@ def event_after_insert(doc, method=None):
     if not outlook_calendar.push_to_outlook_calendar:
         return
 
-    microsoft_user_doc = frappe.get_doc("Microsoft User", doc.custom_outlook_organiser)
-    outlook_event, missing_email_participants = event.insert_cal_event(
-        doc, microsoft_user_doc, outlook_calendar
-    )
-
-    if missing_email_participants:
-        frappe.msgprint(
-            _(
-                "Outlook Calendar - Participant email not found. Did not add attendee for -<br>{0}"
-            ).format(
-                "<br>".join(
-                    f"{d.get('participant_name')} {d.get('ref_dt')} {d.get('ref_dn')}"
-                    for d in missing_email_participants
-                )
-            ),
-            alert=True,
-            indicator="yellow",
-        )
-
-    check_and_set_updates_to_db(doc, outlook_event)
+    notify_missing_email_participants(doc)
+    add_to_outlook_outbox("Create", doc, outlook_calendar)
 
 
 def event_on_update(doc, method=None):
@@ -74,35 +82,21 @@ def event_on_update(doc, method=None):
         cancellation_reason = doc.custom_outlook_reschedule_history[
             len(doc.custom_outlook_reschedule_history) - 1
         ].reschedule_reason
-        event.cancel_cal_event(
-            doc.custom_outlook_event_id,
-            doc.custom_outlook_organiser,
-            cancellation_reason,
-            outlook_calendar.id,
+        add_to_outlook_outbox(
+            "Cancel", doc, outlook_calendar, cancellation_reason=cancellation_reason
         )
     else:
-        microsoft_user_doc = frappe.get_doc(
-            "Microsoft User", doc.custom_outlook_organiser
-        )
-        outlook_event, missing_email_participants = event.update_cal_event(
-            doc, microsoft_user_doc, outlook_calendar
-        )
-
-        if missing_email_participants:
-            frappe.msgprint(
-                _(
-                    "Outlook Calendar - Participant email not found. Did not add attendee for -<br>{0}"
-                ).format(
-                    "<br>".join(
-                        f"{d.get('participant_name')} {d.get('ref_dt')} {d.get('ref_dn')}"
-                        for d in missing_email_participants
-                    )
-                ),
-                alert=True,
-                indicator="yellow",
-            )
+        changed_properties = event_utils.get_changed_outlook_properties(old_doc, doc)
+        if not changed_properties:
+            return
 
-        check_and_set_updates_to_db(doc, outlook_event)
+        notify_missing_email_participants(doc)
+        add_to_outlook_outbox(
+            "Update",
+            doc,
+            outlook_calendar,
+            outlook_properties=",".join(changed_properties),
+        )
 
 
 def event_on_trash(doc, method=None):
@@ -119,18 +113,372 @@ def event_on_trash(doc, method=None):
     if not outlook_calendar.push_to_outlook_calendar:
         return
 
-    delete_res = event.delete_cal_event(
-        doc.custom_outlook_event_id, doc.custom_outlook_organiser, outlook_calendar.id
+    add_to_outlook_outbox("Delete", doc, outlook_calendar)
+
+
+def notify_missing_email_participants(doc):
+    _attendees, missing_email_participants = (
+        event_utils.get_outlook_attendees_from_event(doc)
     )
 
-    if delete_res != "success":
+    if missing_email_participants:
         frappe.msgprint(
-            _("Outlook Server responded with: {0}").format(delete_res),
+            _(
+                "Outlook Calendar - Participant email not found. Did not add attendee for -<br>{0}"
+            ).format(
+                "<br>".join(
+                    f"{d.get('participant_name')} {d.get('ref_dt')} {d.get('ref_dn')}"
+                    for d in missing_email_participants
+                )
+            ),
             alert=True,
             indicator="yellow",
         )
 
 
+def add_to_outlook_outbox(operation, doc, outlook_calendar, **kwargs):
+    if not coalesce_outlook_outbox(
+        operation, doc, kwargs.get("outlook_properties")
+    ):
+        return
+
+    next_attempt_on = utils.now_datetime()
+    if operation == "Update":
+        # Held back briefly so the saves that follow are merged into this entry
+        next_attempt_on = utils.add_to_date(
+            next_attempt_on, seconds=OUTLOOK_OUTBOX_COALESCE_SECONDS
+        )
+
+    frappe.get_doc(
+        {
+            "doctype": "Outlook Event Outbox",
+            "event": doc.name,
+            "operation": operation,
+            "outlook_calendar": outlook_calendar.name,
+            "calendar_id": outlook_calendar.id,
+            "organiser": doc.custom_outlook_organiser,
+            "outlook_event_id": doc.custom_outlook_event_id,
+            "next_attempt_on": next_attempt_on,
+            **kwargs,
+        }
+    ).insert(ignore_permissions=True)
+
+    enqueue_outlook_outbox(enqueue_after_commit=True)
+
+
+def coalesce_outlook_outbox(operation, doc, outlook_properties=None):
+    # Returns False when the operation is already covered by a pending entry.
+    # Rows are locked so an entry being claimed is not merged into at the same time
+    pending_entries = frappe.get_all(
+        "Outlook Event Outbox",
+        {"event": doc.name, "status": "Pending"},
+        ["name", "operation", "attempts", "outlook_properties"],
+        order_by="creation asc",
+        for_update=True,
+    )
+    if not pending_entries:
+        return True
+
+    if operation in ("Create", "Update"):
+        for pending_entry in pending_entries:
+            if pending_entry.operation in ("Create", "Update"):
+                # Entries push the Event as it is when processed, i.e. the final state
+                frappe.db.set_value(
+                    "Outlook Event Outbox",
+                    pending_entry.name,
+                    {
+                        "next_attempt_on": utils.add_to_date(
+                            utils.now_datetime(),
+                            seconds=OUTLOOK_OUTBOX_COALESCE_SECONDS,
+                        ),
+                        "outlook_properties": merge_outlook_properties(
+                            pending_entry.outlook_properties, outlook_properties
+                        ),
+                    },
+                    update_modified=False,
+                )
+                return False
+        return True
+
+    if operation in ("Cancel", "Delete"):
+        superseded_operations = ["Update"]
+        if operation == "Delete":
+            superseded_operations.append("Cancel")
+
+        superseded_entries = [
+            pending_entry.name
+            for pending_entry in pending_entries
+            if pending_entry.operation in superseded_operations
+        ]
+        # A create that was never attempted has not reached Outlook yet
+        unpushed_create = next(
+            (
+                pending_entry.name
+                for pending_entry in pending_entries
+                if pending_entry.operation == "Create" and not pending_entry.attempts
+            ),
+            None,
+        )
+        if unpushed_create:
+            superseded_entries.append(unpushed_create)
+
+        if superseded_entries:
+            frappe.db.delete(
+                "Outlook Event Outbox", {"name": ["in", superseded_entries]}
+            )
+        return not unpushed_create
+
+    return True
+
+
+def merge_outlook_properties(outlook_properties, new_outlook_properties):
+    # Empty means the whole event is pushed, which covers any other change
+    if not outlook_properties or not new_outlook_properties:
+        return None
+
+    return ",".join(
+        sorted(
+            set(outlook_properties.split(",")) | set(new_outlook_properties.split(","))
+        )
+    )
+
+
+def enqueue_outlook_outbox(enqueue_after_commit=False):
+    # A single job id keeps the outbox drained by one worker at a time
+    frappe.enqueue(
+        process_outlook_outbox,
+        queue="short",
+        timeout=OUTLOOK_OUTBOX_TIMEOUT,
+        job_id=OUTLOOK_OUTBOX_JOB_ID,
+        deduplicate=True,
+        enqueue_after_commit=enqueue_after_commit,
+    )
+
+
+def process_outlook_outbox():
+    while True:
+        wait_for_coalescing_outlook_outbox()
+
+        # Failed entries are retried later than now, so they are not picked up again.
+        # Entries left In Progress by a worker that died are picked up once expired.
+        outbox_entries = frappe.get_all(
+            "Outlook Event Outbox",
+            {
+                "status": ["in", ["Pending", "In Progress"]],
+                "next_attempt_on": ["<=", utils.now_datetime()],
+            },
+            pluck="name",
+            order_by="creation asc",
+            limit=OUTLOOK_OUTBOX_BATCH_SIZE,
+        )
+        if not outbox_entries:
+            break
+
+        for outbox_entry in outbox_entries:
+            process_outlook_outbox_entry(outbox_entry)
+
+
+def wait_for_coalescing_outlook_outbox():
+    # Entries held back for coalescing are waited for, rather than left to the scheduler
+    next_attempt_on = frappe.db.get_value(
+        "Outlook Event Outbox",
+        {
+            "status": "Pending",
+            "next_attempt_on": [
+                "between",
+                [
+                    utils.now_datetime(),
+                    utils.add_to_date(
+                        utils.now_datetime(), seconds=OUTLOOK_OUTBOX_COALESCE_SECONDS
+                    ),
+                ],
+            ],
+        },
+        "next_attempt_on",
+        order_by="next_attempt_on asc",
+    )
+    if next_attempt_on:
+        time.sleep(
+            max(
+                utils.time_diff_in_seconds(next_attempt_on, utils.now_datetime()), 0
+            )
+        )
+
+
+def process_outlook_outbox_entry(outbox_entry_name):
+    outbox_entry = frappe.db.get_value(
+        "Outlook Event Outbox", outbox_entry_name, "*", as_dict=True, for_update=True
+    )
+    if (
+        not outbox_entry
+        or outbox_entry.status not in ("Pending", "In Progress")
+        or utils.get_datetime(outbox_entry.next_attempt_on) > utils.now_datetime()
+    ):
+        # Superseded by a later Cancel or Delete, merged into or processed already
+        frappe.db.commit()
+        return
+
+    if has_earlier_outlook_outbox_entries(outbox_entry):
+        # Entries of an Event are pushed in order, e.g. a Cancel waits for its Create
+        frappe.db.set_value(
+            "Outlook Event Outbox",
+            outbox_entry.name,
+            "next_attempt_on",
+            utils.add_to_date(
+                utils.now_datetime(), seconds=OUTLOOK_OUTBOX_RETRY_SECONDS
+            ),
+            update_modified=False,
+        )
+        frappe.db.commit()
+        return
+
+    # Claimed rather than kept locked, so no row lock is held over the Graph call
+    frappe.db.set_value(
+        "Outlook Event Outbox",
+        outbox_entry.name,
+        {
+            "status": "In Progress",
+            "next_attempt_on": utils.add_to_date(
+                utils.now_datetime(), seconds=OUTLOOK_OUTBOX_CLAIM_SECONDS
+            ),
+        },
+        update_modified=False,
+    )
+    frappe.db.commit()
+
+    try:
+        push_outlook_outbox_entry(outbox_entry)
+    except Exception:
+        frappe.db.rollback()
+
+        attempts = outbox_entry.attempts + 1
+        frappe.db.set_value(
+            "Outlook Event Outbox",
+            outbox_entry.name,
+            {
+                "status": (
+                    "Failed" if attempts >= OUTLOOK_OUTBOX_MAX_ATTEMPTS else "Pending"
+                ),
+                "attempts": attempts,
+                "next_attempt_on": utils.add_to_date(
+                    utils.now_datetime(),
+                    seconds=min(
+                        OUTLOOK_OUTBOX_RETRY_SECONDS * 2 ** (attempts - 1),
+                        OUTLOOK_OUTBOX_RETRY_MAX_SECONDS,
+                    ),
+                ),
+                "error": frappe.get_traceback(),
+            },
+        )
+    else:
+        frappe.db.set_value(
+            "Outlook Event Outbox",
+            outbox_entry.name,
+            {
+                "status": "Completed",
+                "attempts": outbox_entry.attempts + 1,
+                "error": None,
+            },
+        )
+
+    frappe.db.commit()
+
+
+def has_earlier_outlook_outbox_entries(outbox_entry):
+    return frappe.db.exists(
+        "Outlook Event Outbox",
+        {
+            "event": outbox_entry.event,
+            "status": ["in", ["Pending", "In Progress"]],
+            "creation": ["<", outbox_entry.creation],
+        },
+    )
+
+
+def get_outlook_transaction_id(outbox_entry):
+    # Retries of an insert keep the id of the Create still being pushed, so Outlook
+    # drops a repeated insert. A later Create, e.g. of a re-opened Event, gets its own.
+    return (
+        frappe.db.get_value(
+            "Outlook Event Outbox",
+            {
+                "event": outbox_entry.event,
+                "operation": "Create",
+                "status": ["in", ["Pending", "In Progress"]],
+                "creation": ["<=", outbox_entry.creation],
+            },
+            "name",
+            order_by="creation asc",
+        )
+        or outbox_entry.name
+    )
+
+
+def push_outlook_outbox_entry(outbox_entry):
+    if outbox_entry.operation == "Delete":
+        if outbox_entry.outlook_event_id:
+            event.delete_cal_event(
+                outbox_entry.outlook_event_id,
+                outbox_entry.organiser,
+                outbox_entry.calendar_id,
+            )
+        return
+
+    if not frappe.db.exists("Event", outbox_entry.event):
+        # Deleted before it could be pushed, the Delete entry takes care of Outlook
+        return
+
+    doc = frappe.get_doc("Event", outbox_entry.event)
+
+    if outbox_entry.operation == "Cancel":
+        event.cancel_cal_event(
+            doc.custom_outlook_event_id or outbox_entry.outlook_event_id,
+            outbox_entry.organiser,
+            outbox_entry.cancellation_reason,
+            outbox_entry.calendar_id,
+        )
+        return
+
+    outlook_calendar = frappe.get_doc("Outlook Calendar", outbox_entry.outlook_calendar)
+    microsoft_user_doc = frappe.get_doc("Microsoft User", doc.custom_outlook_organiser)
+
+    if outbox_entry.operation == "Create" or not doc.custom_outlook_event_id:
+        outlook_event, _missing_email_participants = event.insert_cal_event(
+            doc,
+            microsoft_user_doc,
+            outlook_calendar,
+            transaction_id=get_outlook_transaction_id(outbox_entry),
+        )
+    else:
+        outlook_event, _missing_email_participants = event.update_cal_event(
+            doc,
+            microsoft_user_doc,
+            outlook_calendar,
+            properties=(
+                outbox_entry.outlook_properties.split(",")
+                if outbox_entry.outlook_properties
+                else None
+            ),
+        )
+
+    if outlook_event:
+        check_and_set_updates_to_db(doc, outlook_event, commit=False)
+
+
+def clear_outlook_outbox():
+    frappe.db.delete(
+        "Outlook Event Outbox",
+        {
+            "status": "Completed",
+            "modified": [
+                "<",
+                utils.add_days(utils.now_datetime(), -OUTLOOK_OUTBOX_KEEP_DAYS),
+            ],
+        },
+    )
+    frappe.db.commit()
+
+
 def cancel_event(doc, cancel_reason):
     if doc.status != "Open":
         frappe.throw(f"Can not cancel `{doc.status}` event.")
@@ -238,66 +586,477 @@ def reschedule_event(doc, new_slots, reschedule_reason):
 
 
 @frappe.whitelist()
-def sync_outlook_events():
-    frappe.enqueue(
-        _sync_outlook_events,
-        queue="default",
-        timeout=SYNC_OUTLOOK_EVENT_TIMEOUT,
-        job_name=SYNC_OUTLOOK_EVENT_JOB_NAME,
+def sync_outlook_events(full_sync=False):
+    return sync.enqueue_sync(
+        SYNC_OUTLOOK_EVENT_JOB_NAME,
+        f"{__name__}._sync_outlook_events",
+        SYNC_OUTLOOK_EVENT_PROGRESS_ID,
+        "Outlook Events syncing started in background.",
+        SYNC_OUTLOOK_EVENT_TIMEOUT,
+        sharded=True,
+        full_sync=utils.sbool(full_sync),
     )
-    return {
-        "status": "success",
-        "msg": "Outlook Events syncing started in background.",
-        "track_on": SYNC_OUTLOOK_EVENT_PROGRESS_ID,
+
+
+def _sync_outlook_events(full_sync=False):
+    # Splits the sync into a shard per calendar run in parallel on the sync queue,
+    # only the calendars set to pull from Outlook are synced.
+    outlook_calendars = frappe.db.get_all(
+        "Outlook Calendar",
+        {
+            "enable": 1,
+            "pull_from_outlook_calendar": 1,
+            "microsoft_user": ["is", "set"],
+        },
+        pluck="name",
+        order_by="name asc",
+    )
+
+    # Full sync re-reads the sync window, delta sync only replays the changes
+    if full_sync:
+        job_name = SYNC_OUTLOOK_EVENT_FULL_SYNC_JOB_NAME
+        method = f"{__name__}._sync_calendar_view_events"
+    else:
+        job_name = SYNC_OUTLOOK_EVENT_JOB_NAME
+        method = f"{__name__}._sync_calendar_events"
+
+    sync.enqueue_shards(
+        job_name,
+        method,
+        {
+            outlook_calendar: {"outlook_calendar": outlook_calendar}
+            for outlook_calendar in outlook_calendars
+        },
+        SYNC_OUTLOOK_EVENT_PROGRESS_ID,
+        "Syncing Outlook Events",
+        lock_name=SYNC_OUTLOOK_EVENT_JOB_NAME,
+    )
+
+
+def _sync_calendar_view_events(outlook_calendar, checkpoint=None):
+    sync_stats = frappe._dict(inserted=0, updated=0, skipped=0)
+    committer = sync.ChunkCommitter(checkpoint)
+
+    outlook_calendar = frappe.db.get_value(
+        "Outlook Calendar",
+        outlook_calendar,
+        ["name", "id", "microsoft_user"],
+        as_dict=True,
+    )
+
+    # Resume a calendar stopped midway from the next page it had reached
+    page_link = checkpoint.get("page_link") if checkpoint else None
+    start, end = mi_settings.get_sync_window()
+
+    try:
+        for outlook_events, next_link in event.iter_user_calendar_view_events(
+            outlook_calendar.microsoft_user,
+            outlook_calendar.id,
+            start,
+            end,
+            page_link,
+            parse=False,
+            with_body=not is_event_body_deferred(),
+        ):
+            _sync_outlook_events_page(outlook_events, outlook_calendar, sync_stats)
+            if next_link:
+                committer.add(len(outlook_events), page_link=next_link)
+    except HTTPError as e:
+        if e.response.status_code != 404:
+            raise
+
+    frappe.db.set_value(
+        "Outlook Calendar",
+        outlook_calendar.name,
+        "last_synced_on",
+        utils.now_datetime(),
+        update_modified=False,
+    )
+    committer.commit(page_link=None)
+    return sync_stats
+
+
+def _sync_calendar_events(outlook_calendar, checkpoint=None):
+    sync_stats = frappe._dict(inserted=0, updated=0, skipped=0)
+    committer = sync.ChunkCommitter(checkpoint)
+
+    outlook_calendar = frappe.db.get_value(
+        "Outlook Calendar",
+        outlook_calendar,
+        ["name", "id", "microsoft_user", "delta_link", "delta_window_end"],
+        as_dict=True,
+    )
+
+    # Resume a calendar stopped midway from the next page it had reached
+    delta_link = checkpoint.get("page_link") if checkpoint else None
+    if not delta_link and is_delta_window_current(outlook_calendar.delta_window_end):
+        delta_link = outlook_calendar.delta_link
+
+    try:
+        delta_link = _delta_sync_calendar_events(
+            outlook_calendar, delta_link, sync_stats, committer
+        )
+    except HTTPError as e:
+        if e.response.status_code == 404:
+            return sync_stats
+        if e.response.status_code != 410 or not delta_link:
+            raise
+        # Delta token expired (410 Gone), resync the whole window
+        delta_link = _delta_sync_calendar_events(
+            outlook_calendar, sync_stats=sync_stats, committer=committer
+        )
+
+    frappe.db.set_value(
+        "Outlook Calendar",
+        outlook_calendar.name,
+        {"delta_link": delta_link, "last_synced_on": utils.now_datetime()},
+        update_modified=False,
+    )
+    committer.commit(page_link=None)
+    return sync_stats
+
+
+def _delta_sync_calendar_events(
+    outlook_calendar, delta_link=None, sync_stats=None, committer=None
+):
+    start, end = None, None
+    if not delta_link:
+        start, end = mi_settings.get_sync_window()
+        # The window is kept along with the delta token, which stays bound to it
+        frappe.db.set_value(
+            "Outlook Calendar",
+            outlook_calendar.name,
+            {"delta_link": None, "delta_window_end": end},
+            update_modified=False,
+        )
+
+    next_delta_link = None
+    for outlook_events, removed_event_ids, page_link, page_delta_link in (
+        event.iter_user_calendar_events_delta(
+            outlook_calendar.microsoft_user,
+            outlook_calendar.id,
+            start,
+            end,
+            delta_link,
+            parse=False,
+        )
+    ):
+        _sync_outlook_events_page(outlook_events, outlook_calendar, sync_stats)
+
+        for removed_event_id in removed_event_ids:
+            _remove_outlook_event(removed_event_id)
+
+        next_delta_link = page_delta_link or next_delta_link
+
+        if committer and page_link:
+            committer.add(
+                len(outlook_events) + len(removed_event_ids), page_link=page_link
+            )
+
+    return next_delta_link
+
+
+def is_delta_window_current(delta_window_end):
+    if not delta_window_end:
+        return False
+
+    _start, end = mi_settings.get_sync_window()
+    return utils.date_diff(end, delta_window_end) < SYNC_OUTLOOK_DELTA_WINDOW_DRIFT_DAYS
+
+
+def is_event_body_deferred():
+    return utils.cint(frappe.conf.get("microsoft_defer_event_body"))
+
+
+def _sync_outlook_events_page(events_res, outlook_calendar=None, sync_stats=None):
+    # Takes the events as returned by Graph, they are parsed only when changed
+    events_res = {event_res["id"]: event_res for event_res in events_res}
+    if not events_res:
+        return
+
+    change_keys = dict(
+        frappe.get_all(
+            "Event",
+            {"custom_outlook_event_id": ["in", list(events_res)]},
+            ["custom_outlook_event_id", "custom_outlook_change_key"],
+            as_list=True,
+        )
+    )
+    changed_events_res = [
+        event_res
+        for outlook_event_id, event_res in events_res.items()
+        if outlook_event_id not in change_keys
+        or change_keys[outlook_event_id] != event_res.get("changeKey")
+    ]
+
+    # Events listed without their body get it only once they have changed
+    bodyless_events_res = [
+        event_res for event_res in changed_events_res if "body" not in event_res
+    ]
+    if bodyless_events_res and outlook_calendar:
+        event.set_events_body(outlook_calendar.microsoft_user, bodyless_events_res)
+
+    page_events = {
+        event_res["id"]: event_utils.parse_event_res(event_res)
+        for event_res in changed_events_res
+    }
+
+    if sync_stats is not None:
+        sync_stats.skipped += len(events_res) - len(page_events)
+        sync_stats.inserted += len(set(page_events) - set(change_keys))
+        sync_stats.updated += len(set(page_events) & set(change_keys))
+
+    if not page_events:
+        return
+
+    sync_fields = {
+        fieldname
+        for outlook_event in page_events.values()
+        for fieldname in outlook_event
+        if fieldname != "event_participants"
     }
+    existing_events = {
+        existing_event.custom_outlook_event_id: existing_event
+        for existing_event in frappe.get_all(
+            "Event",
+            {"custom_outlook_event_id": ["in", list(page_events)]},
+            ["name", *sync_fields],
+        )
+    }
+
+    new_events = []
+    event_updates = {}
+    existing_event_participants = {}
+    for outlook_event_id, outlook_event in page_events.items():
+        existing_event = existing_events.get(outlook_event_id)
+        if not existing_event:
+            new_events.append(outlook_event)
+            continue
+
+        existing_event_participants[existing_event.name] = outlook_event.get(
+            "event_participants"
+        )
+        updates = get_updates(existing_event, outlook_event)
+        if updates:
+            event_updates[existing_event.name] = updates
 
+    if event_updates:
+        frappe.db.bulk_update("Event", event_updates)
 
-def _sync_outlook_events():
-    ms_users = frappe.db.get_list("Microsoft User", ["name"])
-    user_ids = [ms_user.name for ms_user in ms_users]
+    if new_events:
+        _bulk_insert_outlook_events(new_events, outlook_calendar)
 
-    outlook_events = event.get_users_events(user_ids)
-    total_events = len(outlook_events)
+    reconcile_outlook_participants(existing_event_participants, update_modified=True)
 
-    for idx, user in enumerate(outlook_events):
-        frappe.publish_realtime(
-            SYNC_OUTLOOK_EVENT_PROGRESS_ID,
+
+def _bulk_insert_outlook_events(outlook_events, outlook_calendar=None):
+    now = utils.now()
+
+    event_docs = []
+    for outlook_event in outlook_events:
+        participants = outlook_event.pop("event_participants", None) or []
+
+        event_doc = frappe.new_doc("Event")
+        event_doc.update(
             {
-                "progress": idx + 1,
-                "total": total_events,
-                "title": "Syncing Outlook Events",
-            },
+                "custom_is_outlook_event": True,
+                "custom_sync_with_ms_calendar": True,
+                "custom_add_teams_meet": (
+                    True if outlook_event["custom_outlook_meeting_link"] else False
+                ),
+                "custom_outlook_calendar": (
+                    outlook_calendar.name if outlook_calendar else None
+                ),
+                **outlook_event,
+            }
         )
+        sync.set_standard_fields(event_doc, None, now)
 
-        for outlook_event in outlook_events[user]:
-            existing_event = frappe.db.exists(
-                "Event",
-                {"custom_outlook_event_id": outlook_event["custom_outlook_event_id"]},
+        for participant in participants:
+            participant_doc = event_doc.append(
+                "custom_outlook_participants", participant
+            )
+            sync.set_standard_fields(
+                participant_doc, frappe.generate_hash(length=10), now
             )
 
-            if existing_event:
-                event_doc = frappe.get_doc("Event", existing_event)
-                check_and_set_updates_to_db(
-                    event_doc, outlook_event, update_modified=True, commit=False
-                )
-            else:
-                participants = outlook_event.pop("event_participants")
-                event_doc = frappe.get_doc(
-                    {
-                        "doctype": "Event",
-                        "custom_is_outlook_event": True,
-                        "custom_sync_with_ms_calendar": True,
-                        "custom_add_teams_meet": (
-                            True
-                            if outlook_event["custom_outlook_meeting_link"]
-                            else False
-                        ),
-                        **outlook_event,
-                    }
-                ).save()
-                check_and_set_participants_updates_to_db(
-                    event_doc, participants, update_modified=True, commit=False
-                )
+        event_docs.append(event_doc)
+
+    _set_event_names(event_docs)
+
+    event_rows, participant_rows = [], []
+    for event_doc in event_docs:
+        event_rows.append(event_doc.get_valid_dict(convert_dates_to_str=True))
+        for participant_doc in event_doc.custom_outlook_participants:
+            participant_doc.parent = event_doc.name
+            participant_rows.append(
+                participant_doc.get_valid_dict(convert_dates_to_str=True)
+            )
+
+    sync.bulk_insert_rows("Event", event_rows)
+    sync.bulk_insert_rows("Outlook Event Participants", participant_rows)
+
+
+def _set_event_names(event_docs):
+    # A plain naming series is reserved as one block per prefix rather than one
+    # counter update per Event, any other naming rule is left to Frappe per Event.
+    autoname = frappe.get_meta("Event").autoname or ""
+    if not _is_plain_naming_series(autoname, event_docs[0]):
+        for event_doc in event_docs:
+            set_new_name(event_doc)
+        return
+
+    prefixes = [
+        _get_naming_series_prefix(autoname, event_doc) for event_doc in event_docs
+    ]
+    next_series_no = {
+        prefix: _reserve_series(prefix, count)
+        for prefix, count in Counter(prefixes).items()
+    }
+    for event_doc, prefix in zip(event_docs, prefixes):
+        series_no = next_series_no[prefix]
+        next_series_no[prefix] += 1
+        event_doc.name = parse_naming_series(
+            autoname,
+            doc=event_doc,
+            number_generator=lambda _prefix, digits, series_no=series_no: str(
+                series_no
+            ).zfill(digits),
+        )
+
+
+def _is_plain_naming_series(autoname, event_doc):
+    # `field:`, `format:` & `naming_series:` rules, Document Naming Rules and
+    # autoname overrides of the controller or hooks don't name from the series alone
+    doc_events = frappe.get_hooks("doc_events") or {}
+    return (
+        "#" in autoname
+        and ":" not in autoname
+        and not hasattr(event_doc, "autoname")
+        and not any(
+            "autoname" in (doc_events.get(doctype) or {}) for doctype in ("Event", "*")
+        )
+        and not frappe.db.exists(
+            "Document Naming Rule", {"document_type": "Event", "disabled": 0}
+        )
+    )
+
+
+def _get_naming_series_prefix(autoname, event_doc):
+    # The series parser hands the prefix to the counter, so no name is drawn here
+    prefix = None
+
+    def capture_prefix(partial_series, digits):
+        nonlocal prefix
+        prefix = partial_series
+        return "#" * digits
+
+    parse_naming_series(autoname, doc=event_doc, number_generator=capture_prefix)
+    return prefix
+
+
+def _reserve_series(prefix, count):
+    # Same counter as `getseries`, moved by `count` under a row lock in one go
+    Series = frappe.qb.DocType("Series")
+    current = (
+        frappe.qb.from_(Series)
+        .where(Series.name == prefix)
+        .for_update()
+        .select(Series.current)
+    ).run()
+
+    if current and current[0][0] is not None:
+        start = utils.cint(current[0][0])
+        frappe.qb.update(Series).set(Series.current, start + count).where(
+            Series.name == prefix
+        ).run()
+    else:
+        start = 0
+        frappe.qb.into(Series).insert(prefix, count).run()
+
+    return start + 1
+
+
+def _remove_outlook_event(outlook_event_id):
+    existing_event = frappe.db.get_value(
+        "Event",
+        {"custom_outlook_event_id": outlook_event_id},
+        ["name", "custom_is_outlook_event", "status"],
+        as_dict=True,
+    )
+    if not existing_event:
+        return
+
+    if existing_event.custom_is_outlook_event:
+        frappe.delete_doc("Event", existing_event.name, ignore_permissions=True)
+    elif existing_event.status != "Cancelled":
+        # Events created from CRM are kept for their history
+        frappe.db.set_value("Event", existing_event.name, "status", "Cancelled")
+
+
+@frappe.whitelist(allow_guest=True, methods=["POST"])
+def receive_outlook_notification(validationToken=None, **kwargs):
+    if validationToken:
+        # Subscription validation handshake, the token must be echoed back as is
+        return Response(validationToken, status=200, mimetype="text/plain")
+
+    notifications = (frappe.request.get_json(silent=True) or {}).get("value") or []
+    client_state = mi_settings.get_notification_client_state()
+
+    for notification in notifications:
+        if not client_state or not hmac.compare_digest(
+            notification.get("clientState") or "", client_state
+        ):
+            continue
+
+        outlook_calendar = frappe.db.get_value(
+            "Outlook Calendar", {"subscription_id": notification.get("subscriptionId")}
+        )
+        outlook_event_id = (notification.get("resourceData") or {}).get("id")
+        if not outlook_calendar or not outlook_event_id:
+            continue
+
+        frappe.enqueue(
+            process_outlook_notification,
+            queue="short",
+            timeout=OUTLOOK_NOTIFICATION_TIMEOUT,
+            job_id=f"outlook_notification::{outlook_calendar}::{outlook_event_id}",
+            deduplicate=True,
+            outlook_calendar=outlook_calendar,
+            change_type=notification.get("changeType"),
+            outlook_event_id=outlook_event_id,
+        )
+
+    return Response(status=202)
+
+
+def process_outlook_notification(outlook_calendar, change_type, outlook_event_id):
+    # Enqueued by the guest webhook, the Events it syncs must not be owned by Guest
+    frappe.set_user("Administrator")
+
+    outlook_calendar = frappe.db.get_value(
+        "Outlook Calendar",
+        outlook_calendar,
+        ["name", "id", "microsoft_user"],
+        as_dict=True,
+    )
+    if not outlook_calendar:
+        return
+
+    if change_type == "deleted":
+        _remove_outlook_event(outlook_event_id)
+    else:
+        try:
+            outlook_event = event.get_user_event(
+                outlook_calendar.microsoft_user, outlook_event_id, parse=False
+            )
+        except HTTPError as e:
+            if e.response.status_code != 404:
+                raise e
+            _remove_outlook_event(outlook_event_id)
+        else:
+            _sync_outlook_events_page([outlook_event], outlook_calendar)
+
     frappe.db.commit()
 
 
@@ -308,18 +1067,31 @@ def check_and_set_updates_to_db(
     notify=True,
     commit=True,
 ):
+    if "event_participants" in new_values:
+        check_and_set_participants_updates_to_db(
+            old_doc,
+            new_values["event_participants"],
+            update_modified=update_modified,
+            commit=commit,
+        )
+
+    new_updates = get_updates(old_doc, new_values)
+    if new_updates:
+        old_doc.db_set(
+            new_updates,
+            update_modified=update_modified,
+            notify=notify,
+            commit=commit,
+        )
+
+
+def get_updates(old_values, new_values):
     new_updates = {}
     for fieldname, new_value in new_values.items():
-        old_value = old_doc.get(fieldname)
+        old_value = old_values.get(fieldname)
 
         if fieldname == "event_participants":
-            check_and_set_participants_updates_to_db(
-                old_doc,
-                new_value,
-                update_modified=update_modified,
-                notify=notify,
-                commit=commit,
-            )
+            continue
 
         elif isinstance(new_value, utils.datetime.datetime):
             old_value_dt = utils.get_datetime(old_value)
@@ -329,61 +1101,158 @@ def check_and_set_updates_to_db(
         elif old_value != new_value:
             new_updates[fieldname] = new_value
 
-    if new_updates:
-        old_doc.db_set(
-            new_updates,
-            update_modified=update_modified,
-            notify=notify,
-            commit=commit,
-        )
+    return new_updates
 
 
 def check_and_set_participants_updates_to_db(
     event_doc,
     outlook_participants,
     update_modified=False,
-    notify=True,
     commit=True,
 ):
-    prev_doc_participants = {
-        participant.email: participant for participant in event_doc.event_participants
-    }
-    prev_outlook_particpants = {
-        participant.email: participant
-        for participant in event_doc.custom_outlook_participants
-    }
-    next_outlook_idx = len(prev_outlook_particpants) + 1
-
-    for new_participant in outlook_participants or []:
-        new_participant_email = new_participant.get("email")
-        if new_participant_email in prev_doc_participants:
-            check_and_set_updates_to_db(
-                prev_doc_participants[new_participant_email],
-                outlook_partcipant_to_event(new_participant),
-                update_modified=update_modified,
-                notify=notify,
-                commit=commit,
-            )
-        elif new_participant_email in prev_outlook_particpants:
-            check_and_set_updates_to_db(
-                prev_outlook_particpants[new_participant_email],
-                new_participant,
-                update_modified=update_modified,
-                notify=notify,
-                commit=commit,
+    reconcile_outlook_participants(
+        {event_doc.name: outlook_participants}, update_modified=update_modified
+    )
+
+    if commit:
+        frappe.db.commit()
+
+
+def reconcile_outlook_participants(events_participants, update_modified=False):
+    # Attendees matching an Event Participant by email update it, the rest are kept
+    # as Outlook Event Participants, which are removed once gone from Outlook.
+    if not events_participants:
+        return
+
+    event_names = list(events_participants)
+    doc_participants = _get_event_participants_by_email(
+        "Event Participants",
+        event_names,
+        "event_participants",
+        list(outlook_partcipant_to_event({})),
+    )
+    outlook_participants = _get_event_participants_by_email(
+        "Outlook Event Participants",
+        event_names,
+        "custom_outlook_participants",
+        [
+            "idx",
+            "email",
+            "participant_name",
+            "is_required",
+            "response",
+            "response_time",
+        ],
+    )
+
+    doc_participant_updates, outlook_participant_updates = {}, {}
+    new_outlook_participants, removed_outlook_participants = [], []
+    for event_name, participants in events_participants.items():
+        event_doc_participants = doc_participants.get(event_name, {})
+        event_outlook_participants = outlook_participants.get(event_name, {})
+        next_outlook_idx = (
+            max(
+                (
+                    participant.idx
+                    for participant in event_outlook_participants.values()
+                ),
+                default=0,
             )
-        else:
-            frappe.get_doc(
-                {
-                    "doctype": "Outlook Event Participants",
-                    "parent": event_doc.name,
-                    "parenttype": event_doc.doctype,
-                    "parentfield": "custom_outlook_participants",
-                    "idx": next_outlook_idx,
-                    **new_participant,
-                }
-            ).save(ignore_permissions=True)
-            next_outlook_idx += 1
+            + 1
+        )
+
+        participant_emails = set()
+        for participant in participants or []:
+            participant_email = participant.get("email")
+            participant_emails.add(participant_email)
+
+            if participant_email in event_doc_participants:
+                existing_participant = event_doc_participants[participant_email]
+                updates = get_updates(
+                    existing_participant, outlook_partcipant_to_event(participant)
+                )
+                if updates:
+                    doc_participant_updates[existing_participant.name] = updates
+
+            elif participant_email in event_outlook_participants:
+                existing_participant = event_outlook_participants[participant_email]
+                updates = get_updates(existing_participant, participant)
+                if updates:
+                    outlook_participant_updates[existing_participant.name] = updates
+
+            else:
+                new_outlook_participants.append(
+                    {
+                        "parent": event_name,
+                        "idx": next_outlook_idx,
+                        **participant,
+                    }
+                )
+                next_outlook_idx += 1
+
+        removed_outlook_participants.extend(
+            existing_participant.name
+            for email, existing_participant in event_outlook_participants.items()
+            if email not in participant_emails
+        )
+
+    if doc_participant_updates:
+        frappe.db.bulk_update(
+            "Event Participants",
+            doc_participant_updates,
+            update_modified=update_modified,
+        )
+    if outlook_participant_updates:
+        frappe.db.bulk_update(
+            "Outlook Event Participants",
+            outlook_participant_updates,
+            update_modified=update_modified,
+        )
+    if removed_outlook_participants:
+        frappe.db.delete(
+            "Outlook Event Participants", {"name": ["in", removed_outlook_participants]}
+        )
+    if new_outlook_participants:
+        _bulk_insert_outlook_participants(new_outlook_participants)
+
+
+def _get_event_participants_by_email(doctype, event_names, parentfield, fields):
+    event_participants = {}
+    for participant in frappe.get_all(
+        doctype,
+        {
+            "parenttype": "Event",
+            "parentfield": parentfield,
+            "parent": ["in", event_names],
+        },
+        ["name", "parent", *fields],
+        order_by="idx asc",
+    ):
+        event_participants.setdefault(participant.parent, {})[
+            participant.email
+        ] = participant
+    return event_participants
+
+
+def _bulk_insert_outlook_participants(outlook_participants):
+    now = utils.now()
+
+    participant_rows = []
+    for outlook_participant in outlook_participants:
+        participant_doc = frappe.new_doc("Outlook Event Participants")
+        participant_doc.update(
+            {
+                "parenttype": "Event",
+                "parentfield": "custom_outlook_participants",
+                **outlook_participant,
+            }
+        )
+        sync.set_standard_fields(participant_doc, frappe.generate_hash(length=10), now)
+        participant_rows.append(
+            participant_doc.get_valid_dict(convert_dates_to_str=True)
+        )
+
+    sync.bulk_insert_rows("Outlook Event Participants", participant_rows)
 
 
 def outlook_partcipant_to_event(outlook_participant):
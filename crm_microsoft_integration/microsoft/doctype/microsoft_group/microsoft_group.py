@@ -1,13 +1,21 @@
 # Copyright (c) 2025, OneHash and contributors
 # For license information, please see license.txt
 
+import json
 import frappe
+from frappe import utils
 from frappe.model.document import Document
+from requests.exceptions import HTTPError
+from crm_microsoft_integration.microsoft import sync
+from crm_microsoft_integration.microsoft.integration import client
 from crm_microsoft_integration.microsoft.integration.group import group
 
 SYNC_MS_GROUP_TIMEOUT = 25 * 60
 SYNC_MS_GROUP_JOB_NAME = "sync_microsoft_groups"
 SYNC_MS_GROUP_PROGRESS_ID = "sync_microsoft_groups_progress"
+SYNC_MS_GROUP_DELTA_LINK_KEY = "microsoft_groups_delta_link"
+SYNC_MS_GROUP_UNAPPLIED_MEMBERS_KEY = "microsoft_groups_unapplied_members"
+MS_GROUP_MEMBERS_BATCH_SIZE = 1000
 
 
 class MicrosoftGroup(Document):
@@ -30,95 +38,289 @@ def get_group_users(group_name):
 
 @frappe.whitelist()
 def sync_ms_groups():
-    frappe.enqueue(
-        _sync_ms_groups,
-        queue="default",
-        timeout=SYNC_MS_GROUP_TIMEOUT,
-        job_name=SYNC_MS_GROUP_JOB_NAME,
+    return sync.enqueue_sync(
+        SYNC_MS_GROUP_JOB_NAME,
+        f"{__name__}._sync_ms_groups",
+        SYNC_MS_GROUP_PROGRESS_ID,
+        "Microsoft Groups syncing started in background.",
+        SYNC_MS_GROUP_TIMEOUT,
     )
-    return {
-        "status": "success",
-        "msg": "Microsoft Groups syncing started in background.",
-        "track_on": SYNC_MS_GROUP_PROGRESS_ID,
-    }
 
 
 def _sync_ms_groups():
-    ms_groups = group.get_groups(with_users=True)
-    total_groups = len(ms_groups)
+    client.reset_retry_stats()
 
-    member_users = []
-    user_wise_groups = {}
+    checkpoint = sync.SyncCheckpoint(SYNC_MS_GROUP_JOB_NAME)
+    committer = sync.ChunkCommitter(checkpoint)
+    sync_stats = frappe._dict(
+        groups=0, removed_groups=0, members=0, removed_members=0, skipped_members=0
+    )
+    sync_stats.update(checkpoint.get("sync_stats") or {})
+    unapplied_members = _retry_unapplied_ms_group_members(checkpoint, sync_stats)
+
+    # Only the groups & memberships changed since the stored delta link are
+    # fetched, a stopped round is resumed from the page it had reached.
+    page_link = checkpoint.get("page_link")
+    round_started_on = checkpoint.get("round_started_on") if page_link else None
+    delta_link = page_link or frappe.db.get_global(SYNC_MS_GROUP_DELTA_LINK_KEY)
+    try:
+        delta_link = _delta_sync_ms_groups(
+            delta_link, sync_stats, committer, unapplied_members, round_started_on
+        )
+    except HTTPError as e:
+        if e.response.status_code != 410 or not delta_link:
+            raise
+        delta_link = _delta_sync_ms_groups(
+            None, sync_stats, committer, unapplied_members
+        )
+
+    frappe.db.set_global(SYNC_MS_GROUP_DELTA_LINK_KEY, delta_link)
+    frappe.db.set_global(
+        SYNC_MS_GROUP_UNAPPLIED_MEMBERS_KEY, json.dumps(sorted(unapplied_members))
+    )
+    committer.finish()
+    return sync_stats
+
+
+def _delta_sync_ms_groups(
+    delta_link, sync_stats, committer, unapplied_members, round_started_on=None
+):
+    # A new round lists every membership, the ones it leaves out are stale. Listed
+    # memberships are stamped page by page, so a stopped round resumes like any other.
+    if not delta_link:
+        round_started_on = utils.now()
+        # Memberships still unapplied are listed again
+        unapplied_members.clear()
 
-    # Update Groups
-    for idx, ms_group in enumerate(ms_groups):
+    next_delta_link = None
+    for (
+        ms_groups,
+        removed_group_ids,
+        added_members,
+        removed_members,
+        page_link,
+        page_delta_link,
+    ) in group.iter_groups_delta(delta_link):
+        for ms_group in ms_groups:
+            _sync_ms_group(ms_group)
+
+        inserted_members, deleted_members, skipped_members = _sync_ms_group_members(
+            added_members, removed_members, stamp_existing=bool(round_started_on)
+        )
+
+        for removed_group_id in removed_group_ids:
+            _remove_ms_group(removed_group_id)
+
+        # Unapplied memberships are dropped once removed, or once their group is
+        unapplied_members.difference_update(removed_members)
+        unapplied_members.difference_update(
+            {member for member in unapplied_members if member[1] in removed_group_ids}
+        )
+        unapplied_members.update(skipped_members)
+
+        sync_stats.groups += len(ms_groups)
+        sync_stats.removed_groups += len(removed_group_ids)
+        sync_stats.members += inserted_members
+        sync_stats.removed_members += deleted_members
+        sync_stats.skipped_members += len(skipped_members)
+        next_delta_link = page_delta_link or next_delta_link
+
+        synced = sync_stats.groups + sync_stats.removed_groups
         frappe.publish_realtime(
             SYNC_MS_GROUP_PROGRESS_ID,
             {
-                "progress": idx + 1,
-                "total": total_groups,
+                "progress": synced,
+                "total": synced + 1 if page_link else synced,
                 "title": "Syncing Microsoft Groups",
+                "retry_stats": client.get_retry_stats(),
             },
         )
 
-        users = ms_group.pop("users")
-        for user in users:
-            if user["id"] in user_wise_groups:
-                user_wise_groups[user["id"]].append(ms_group["id"])
-            else:
-                user_wise_groups[user["id"]] = [ms_group["id"]]
-                member_users.append(user["id"])
-
-        existing_group = frappe.db.exists("Microsoft Group", {"id": ms_group["id"]})
-        if existing_group:
-            group_doc = frappe.get_doc("Microsoft Group", existing_group)
-            has_group_updated = False
-            for fieldname, new_value in ms_group.items():
-                old_value = group_doc.get(fieldname)
-
-                if old_value != new_value:
-                    group_doc.set(fieldname, new_value)
-                    has_group_updated = True
-
-            if has_group_updated:
-                group_doc.save()
-        else:
-            frappe.get_doc({"doctype": "Microsoft Group", **ms_group}).save()
-
-    # Update Group users
-    for user in member_users:
-        user_doc = frappe.get_doc("Microsoft User", user)
-        old_groups = user_doc.get("groups")
-        has_user_updated = False
-
-        old_group_names = {user_group.microsoft_group for user_group in old_groups}
-
-        for new_user_group in user_wise_groups[user]:
-            if new_user_group not in old_group_names:
-                user_doc.append("groups", {"microsoft_group": new_user_group})
-                has_user_updated = True
-            else:
-                old_group_names.remove(new_user_group)
-
-        for old_group in old_groups:
-            if old_group.microsoft_group in old_group_names:
-                user_doc.remove(old_group)
-                has_user_updated = True
-
-        if has_user_updated:
-            user_doc.save()
-
-    ## Remove users that are removed from all the groups
-    old_group_members = frappe.db.get_all(
+        changes = (
+            len(ms_groups)
+            + len(removed_group_ids)
+            + len(added_members)
+            + len(removed_members)
+        )
+        committer.add(
+            changes or 1,
+            page_link=page_link,
+            sync_stats=sync_stats,
+            unapplied_members=sorted(unapplied_members),
+            round_started_on=round_started_on,
+        )
+
+    if round_started_on:
+        sync_stats.removed_members += _remove_stale_ms_group_members(round_started_on)
+
+    return next_delta_link
+
+
+def _retry_unapplied_ms_group_members(checkpoint, sync_stats):
+    # Memberships skipped as their user or group wasn't synced yet, e.g. a user added
+    # after the last Microsoft Users sync, are retried on every sync
+    unapplied_members = checkpoint.get("unapplied_members")
+    if unapplied_members is None:
+        unapplied_members = json.loads(
+            frappe.db.get_global(SYNC_MS_GROUP_UNAPPLIED_MEMBERS_KEY) or "[]"
+        )
+
+    inserted_members, _deleted_members, skipped_members = _sync_ms_group_members(
+        [tuple(member) for member in unapplied_members], []
+    )
+    sync_stats.members += inserted_members
+    return set(skipped_members)
+
+
+def _sync_ms_group(ms_group):
+    existing_group = frappe.db.exists("Microsoft Group", {"id": ms_group["id"]})
+    if existing_group:
+        group_doc = frappe.get_doc("Microsoft Group", existing_group)
+        has_group_updated = False
+        for fieldname, new_value in ms_group.items():
+            old_value = group_doc.get(fieldname)
+
+            if old_value != new_value:
+                group_doc.set(fieldname, new_value)
+                has_group_updated = True
+
+        if has_group_updated:
+            group_doc.save()
+    else:
+        frappe.get_doc({"doctype": "Microsoft Group", **ms_group}).save()
+
+
+def _remove_ms_group(group_id):
+    frappe.db.delete(
+        "Microsoft Groups",
+        {
+            "microsoft_group": group_id,
+            "parenttype": "Microsoft User",
+            "parentfield": "groups",
+        },
+    )
+    frappe.delete_doc(
+        "Microsoft Group", group_id, ignore_missing=True, ignore_permissions=True
+    )
+
+
+def _sync_ms_group_members(added_members, removed_members, stamp_existing=False):
+    # (user_id, group_id) edges are diffed against the `Microsoft Groups` rows of their
+    # users, the edges of users or groups not synced yet are skipped and returned.
+    removed_members = set(removed_members)
+    added_members = set(added_members) - removed_members
+    if not (added_members or removed_members):
+        return 0, 0, []
+
+    existing_members, last_idx = {}, {}
+    for member in frappe.get_all(
+        "Microsoft Groups",
+        {
+            "parenttype": "Microsoft User",
+            "parentfield": "groups",
+            "parent": [
+                "in",
+                list({user for user, _group in added_members | removed_members}),
+            ],
+        },
+        ["name", "parent", "microsoft_group", "idx"],
+    ):
+        existing_members[(member.parent, member.microsoft_group)] = member.name
+        last_idx[member.parent] = max(last_idx.get(member.parent, 0), member.idx)
+
+    new_members = sorted(added_members - set(existing_members))
+    skipped_members = []
+    if new_members:
+        ms_users = set(
+            frappe.get_all(
+                "Microsoft User",
+                {"name": ["in", list({user for user, _group in new_members})]},
+                pluck="name",
+            )
+        )
+        ms_groups = set(
+            frappe.get_all(
+                "Microsoft Group",
+                {"name": ["in", list({group for _user, group in new_members})]},
+                pluck="name",
+            )
+        )
+        skipped_members = [
+            (user, user_group)
+            for user, user_group in new_members
+            if user not in ms_users or user_group not in ms_groups
+        ]
+        new_members = sorted(set(new_members) - set(skipped_members))
+
+    stale_members = [
+        existing_members[member]
+        for member in removed_members
+        if member in existing_members
+    ]
+
+    if stamp_existing:
+        _stamp_ms_group_members(
+            [
+                existing_members[member]
+                for member in added_members
+                if member in existing_members
+            ]
+        )
+
+    _delete_ms_group_members(stale_members)
+    _bulk_insert_ms_group_members(new_members, last_idx)
+    return len(new_members), len(stale_members), skipped_members
+
+
+def _stamp_ms_group_members(member_names):
+    MicrosoftGroups = frappe.qb.DocType("Microsoft Groups")
+    now = utils.now()
+    for names in utils.create_batch(member_names, MS_GROUP_MEMBERS_BATCH_SIZE):
+        frappe.qb.update(MicrosoftGroups).set(MicrosoftGroups.modified, now).where(
+            MicrosoftGroups.name.isin(names)
+        ).run()
+
+
+def _remove_stale_ms_group_members(round_started_on):
+    # Memberships a new round did not list were not stamped since it started
+    stale_members = frappe.get_all(
         "Microsoft Groups",
-        ["name"],
         {
-            "parent": ["not in", member_users],
             "parenttype": "Microsoft User",
             "parentfield": "groups",
+            "modified": ["<", round_started_on],
         },
+        pluck="name",
     )
-    for old_member in old_group_members:
-        frappe.get_doc("Microsoft Groups", old_member).delete()
+    _delete_ms_group_members(stale_members)
+    return len(stale_members)
+
+
+def _delete_ms_group_members(member_names):
+    for names in utils.create_batch(member_names, MS_GROUP_MEMBERS_BATCH_SIZE):
+        frappe.db.delete("Microsoft Groups", {"name": ["in", names]})
+
+
+def _bulk_insert_ms_group_members(members, last_idx):
+    if not members:
+        return
+
+    now = utils.now()
+    member_rows = []
+    for user, user_group in members:
+        last_idx[user] = last_idx.get(user, 0) + 1
+
+        member_doc = frappe.new_doc("Microsoft Groups")
+        member_doc.update(
+            {
+                "parent": user,
+                "parenttype": "Microsoft User",
+                "parentfield": "groups",
+                "idx": last_idx[user],
+                "microsoft_group": user_group,
+            }
+        )
+        sync.set_standard_fields(member_doc, frappe.generate_hash(length=10), now)
+        member_rows.append(member_doc.get_valid_dict(convert_dates_to_str=True))
 
-    frappe.db.commit()
+    sync.bulk_insert_rows("Microsoft Groups", member_rows)
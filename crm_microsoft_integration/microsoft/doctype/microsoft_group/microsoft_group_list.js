@@ -17,7 +17,7 @@ function addSyncMSGroupBtn(listview) {
         "crm_microsoft_integration.microsoft.doctype.microsoft_group.microsoft_group.sync_ms_groups",
       callback: function (response) {
         if (response && response.message) {
-          if (response.message.status === "success") {
+          if (["success", "running"].includes(response.message.status)) {
             frappe.show_alert(
               response.message.msg || "Microsoft Groups syncing started.",
               5,
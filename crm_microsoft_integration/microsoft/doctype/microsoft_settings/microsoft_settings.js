@@ -13,6 +13,26 @@ frappe.ui.form.on("Microsoft Settings", {
       redirectToUri(consentUri);
     }
   },
+
+  release_sync_locks(frm) {
+    frappe.confirm(
+      "Release the locks of all Microsoft syncs? A sync that is still running may then run twice.",
+      () => {
+        frappe.call({
+          method: "crm_microsoft_integration.microsoft.sync.release_sync_locks",
+          callback: function (response) {
+            frappe.show_alert(
+              {
+                indicator: "green",
+                message: `Released ${response.message || 0} sync lock(s).`,
+              },
+              5,
+            );
+          },
+        });
+      },
+    );
+  },
 });
 
 function getConsentUri() {
@@ -4,7 +4,11 @@
 import frappe
 from frappe import utils as f_utils
 from frappe.model.document import Document
-from crm_microsoft_integration.microsoft.integration import utils
+from crm_microsoft_integration.microsoft.integration import auth, utils
+
+# Used while `sync_past_days`/`sync_future_days` are not set
+SYNC_PAST_DAYS = 90
+SYNC_FUTURE_DAYS = 365
 
 
 class MicrosoftSettings(Document):
@@ -13,6 +17,26 @@ class MicrosoftSettings(Document):
     def redirect_uri(self):
         return utils.get_redirect_uri()
 
+    def on_update(self):
+        if any(
+            self.has_value_changed(fieldname)
+            for fieldname in ("enabled", "tenant_id", "client_id")
+        ):
+            auth.clear_access_token_cache()
+
+        if any(
+            self.has_value_changed(fieldname)
+            for fieldname in ("sync_past_days", "sync_future_days")
+        ):
+            # Delta links are bound to the window they were started with
+            frappe.db.set_value(
+                "Outlook Calendar",
+                {"delta_link": ["is", "set"]},
+                "delta_link",
+                None,
+                update_modified=False,
+            )
+
 
 def get_mi_settings(raise_exception=True):
     mi_settings = frappe.get_single("Microsoft Settings")
@@ -22,6 +46,22 @@ def get_mi_settings(raise_exception=True):
     return mi_settings
 
 
+def get_sync_window():
+    past_days = (
+        f_utils.cint(frappe.db.get_single_value("Microsoft Settings", "sync_past_days"))
+        or SYNC_PAST_DAYS
+    )
+    future_days = (
+        f_utils.cint(
+            frappe.db.get_single_value("Microsoft Settings", "sync_future_days")
+        )
+        or SYNC_FUTURE_DAYS
+    )
+
+    today = f_utils.getdate()
+    return f_utils.add_days(today, -past_days), f_utils.add_days(today, future_days)
+
+
 @frappe.whitelist()
 def get_consent_uri():
     mi_settings = get_mi_settings()
@@ -61,7 +101,7 @@ def verify_consent_permit(tenant, consent_id, admin_consent):
     return True
 
 
-def get_access_token():
+def get_access_token(with_expiry=False):
     mi_settings = get_mi_settings()
 
     if (
@@ -69,9 +109,14 @@ def get_access_token():
         or f_utils.get_datetime(mi_settings.access_token_expiry)
         <= f_utils.get_datetime()
     ):
-        return None
+        return (None, None) if with_expiry else None
 
-    return f"{mi_settings.token_type} {mi_settings.get_password('access_token')}"
+    access_token = (
+        f"{mi_settings.token_type} {mi_settings.get_password('access_token')}"
+    )
+    if with_expiry:
+        return access_token, f_utils.get_datetime(mi_settings.access_token_expiry)
+    return access_token
 
 
 def set_access_token(token_type, access_token, expires_in):
@@ -99,3 +144,17 @@ def get_client_credentials():
         "client_id": mi_settings.client_id,
         "client_secret": mi_settings.get_password("client_secret_value"),
     }
+
+
+def get_notification_client_state(generate=False):
+    mi_settings = get_mi_settings()
+    client_state = mi_settings.get_password(
+        "notification_client_state", raise_exception=False
+    )
+
+    if not client_state and generate:
+        client_state = frappe.generate_hash(length=64)
+        mi_settings.set("notification_client_state", client_state)
+        mi_settings.save(ignore_permissions=True)
+
+    return client_state
@@ -2,12 +2,18 @@
 # For license information, please see license.txt
 
 import frappe
+from frappe import utils
 from frappe.model.document import Document
+from frappe.query_builder.functions import Lower
+from requests.exceptions import HTTPError
+from crm_microsoft_integration.microsoft import sync
+from crm_microsoft_integration.microsoft.integration import client
 from crm_microsoft_integration.microsoft.integration.user import user
 
 SYNC_MS_USER_TIMEOUT = 25 * 60
 SYNC_MS_USER_JOB_NAME = "sync_microsoft_users"
 SYNC_MS_USER_PRGRESS_ID = "sync_microsoft_users_progress"
+SYNC_MS_USER_DELTA_LINK_KEY = "microsoft_users_delta_link"
 
 
 class MicrosoftUser(Document):
@@ -16,56 +22,190 @@ class MicrosoftUser(Document):
 
 @frappe.whitelist()
 def sync_ms_users():
-    frappe.enqueue(
-        _sync_ms_users,
-        queue="default",
-        timeout=SYNC_MS_USER_TIMEOUT,
-        job_name=SYNC_MS_USER_JOB_NAME,
+    return sync.enqueue_sync(
+        SYNC_MS_USER_JOB_NAME,
+        f"{__name__}._sync_ms_users",
+        SYNC_MS_USER_PRGRESS_ID,
+        "Microsoft Users syncing started in background.",
+        SYNC_MS_USER_TIMEOUT,
     )
-    return {
-        "status": "success",
-        "msg": "Microsoft Users syncing started in background.",
-        "track_on": SYNC_MS_USER_PRGRESS_ID,
-    }
 
 
 def _sync_ms_users():
-    ms_users = user.get_users()
-    total = len(ms_users)
+    client.reset_retry_stats()
+
+    checkpoint = sync.SyncCheckpoint(SYNC_MS_USER_JOB_NAME)
+    committer = sync.ChunkCommitter(checkpoint)
+    sync_stats = frappe._dict(synced=0, removed=0, kept=0, matched=0, unmatched=0)
+    sync_stats.update(checkpoint.get("sync_stats") or {})
+
+    # Only the users changed since the stored delta link are fetched, a stopped
+    # round is resumed from the page it had reached.
+    delta_link = checkpoint.get("page_link") or frappe.db.get_global(
+        SYNC_MS_USER_DELTA_LINK_KEY
+    )
+    try:
+        delta_link = _delta_sync_ms_users(delta_link, sync_stats, committer)
+    except HTTPError as e:
+        if e.response.status_code != 410 or not delta_link:
+            raise
+        # Delta token expired (410 Gone), start a new round
+        delta_link = _delta_sync_ms_users(None, sync_stats, committer)
 
-    for idx, ms_user in enumerate(ms_users):
+    frappe.db.set_global(SYNC_MS_USER_DELTA_LINK_KEY, delta_link)
+    committer.finish()
+    return sync_stats
+
+
+def _delta_sync_ms_users(delta_link, sync_stats, committer):
+    next_delta_link = None
+    for ms_users, removed_user_ids, page_link, page_delta_link in (
+        user.iter_users_delta(delta_link)
+    ):
+        _sync_ms_users_page(ms_users, sync_stats)
+
+        removed_users = sum(
+            _remove_ms_user(removed_user_id) for removed_user_id in removed_user_ids
+        )
+
+        sync_stats.synced += len(ms_users)
+        sync_stats.removed += removed_users
+        sync_stats.kept += len(removed_user_ids) - removed_users
+        next_delta_link = page_delta_link or next_delta_link
+
+        # Delta rounds have no count, the total runs one ahead until the last page
+        synced = sync_stats.synced + sync_stats.removed + sync_stats.kept
         frappe.publish_realtime(
             SYNC_MS_USER_PRGRESS_ID,
-            {"progress": idx + 1, "total": total, "title": "Syncing Microsoft Users"},
+            {
+                "progress": synced,
+                "total": synced + 1 if page_link else synced,
+                "title": "Syncing Microsoft Users",
+                "matched": sync_stats.matched,
+                "unmatched": sync_stats.unmatched,
+                "retry_stats": client.get_retry_stats(),
+            },
+        )
+
+        # A page is resumed as a whole, so checkpoints are only taken between pages
+        committer.add(
+            len(ms_users) + len(removed_user_ids) or 1,
+            page_link=page_link,
+            sync_stats=sync_stats,
         )
-        existing_user = frappe.db.exists("Microsoft User", {"id": ms_user.get("id")})
 
-        user_doc = None
-        has_updated = False
+    return next_delta_link
 
-        if existing_user:
-            user_doc = frappe.get_doc("Microsoft User", existing_user)
-            for fieldname, new_value in ms_user.items():
-                old_value = user_doc.get(fieldname)
 
-                if old_value != new_value:
-                    user_doc.set(fieldname, new_value)
-                    has_updated = True
+def _sync_ms_users_page(ms_users, sync_stats=None):
+    # Users not linked to a system User yet are matched by `mail` or `principal_name`
+    # against one email map of the page, ignoring case.
+    ms_users = {ms_user["id"]: ms_user for ms_user in ms_users}
+    if not ms_users:
+        return
 
-            if has_updated:
-                user_doc.save()
-        else:
-            has_updated = True
-            user_doc = frappe.get_doc({"doctype": "Microsoft User", **ms_user})
+    existing_users = {
+        existing_user.name: existing_user
+        for existing_user in frappe.get_all(
+            "Microsoft User",
+            {"name": ["in", list(ms_users)]},
+            ["name", "id", "display_name", "mail", "principal_name", "user"],
+        )
+    }
+
+    # Changed users only carry their changed properties, merged over the stored ones
+    merged_users = {
+        user_id: {**existing_users.get(user_id, {}), **ms_user}
+        for user_id, ms_user in ms_users.items()
+    }
+    system_users = _get_system_users_by_email(
+        email
+        for ms_user in merged_users.values()
+        if not ms_user.get("user")
+        for email in (ms_user.get("mail"), ms_user.get("principal_name"))
+        if email
+    )
 
-        if not user_doc.user:
-            existing_system_user = frappe.db.exists(
-                "User", {"email": user_doc.mail or user_doc.principal_name}
+    new_users, user_updates = [], {}
+    for user_id, ms_user in ms_users.items():
+        merged_user = merged_users[user_id]
+        if not merged_user.get("user"):
+            system_user = next(
+                (
+                    system_users[email.lower()]
+                    for email in (
+                        merged_user.get("mail"),
+                        merged_user.get("principal_name"),
+                    )
+                    if email and email.lower() in system_users
+                ),
+                None,
             )
-            if existing_system_user:
-                user_doc.set("user", existing_system_user)
-                has_updated = True
+            if sync_stats is not None:
+                sync_stats.matched += 1 if system_user else 0
+                sync_stats.unmatched += 0 if system_user else 1
+            if system_user:
+                ms_user["user"] = system_user
+
+        existing_user = existing_users.get(user_id)
+        if not existing_user:
+            new_users.append(ms_user)
+            continue
+
+        updates = {
+            fieldname: new_value
+            for fieldname, new_value in ms_user.items()
+            if existing_user.get(fieldname) != new_value
+        }
+        if updates:
+            user_updates[user_id] = updates
+
+    if user_updates:
+        frappe.db.bulk_update("Microsoft User", user_updates)
+
+    if new_users:
+        _bulk_insert_ms_users(new_users)
+
+
+def _get_system_users_by_email(emails):
+    emails = list({email.lower() for email in emails})
+    if not emails:
+        return {}
+
+    User = frappe.qb.DocType("User")
+    return {
+        email.lower(): name
+        for name, email in frappe.qb.from_(User)
+        .select(User.name, User.email)
+        .where(Lower(User.email).isin(emails))
+        .run()
+    }
+
+
+def _bulk_insert_ms_users(ms_users):
+    now = utils.now()
+    user_rows = []
+    for ms_user in ms_users:
+        user_doc = frappe.new_doc("Microsoft User")
+        user_doc.update(ms_user)
+        sync.set_standard_fields(user_doc, ms_user["id"], now)
+        user_rows.append(user_doc.get_valid_dict(convert_dates_to_str=True))
+
+    sync.bulk_insert_rows("Microsoft User", user_rows)
+
+
+def _remove_ms_user(user_id):
+    try:
+        frappe.delete_doc(
+            "Microsoft User", user_id, ignore_missing=True, ignore_permissions=True
+        )
+    except frappe.LinkExistsError:
+        # Still referenced by calendars or slots, kept until those are removed
+        frappe.log_error(
+            "Microsoft User removed in Microsoft is still linked",
+            reference_doctype="Microsoft User",
+            reference_name=user_id,
+        )
+        return False
 
-        if has_updated:
-            user_doc.save()
-    frappe.db.commit()
+    return True
@@ -17,7 +17,7 @@ function addSyncMSUserBtn(listview) {
         "crm_microsoft_integration.microsoft.doctype.microsoft_user.microsoft_user.sync_ms_users",
       callback: function (response) {
         if (response && response.message) {
-          if (response.message.status === "success") {
+          if (["success", "running"].includes(response.message.status)) {
             frappe.show_alert(
               response.message.msg || "Microsoft Users syncing started.",
               5,
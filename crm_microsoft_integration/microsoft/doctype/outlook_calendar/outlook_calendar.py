@@ -2,8 +2,17 @@
 # For license information, please see license.txt
 
 import frappe
+from frappe import utils
 from frappe.model.document import Document
+from requests.exceptions import HTTPError
+from crm_microsoft_integration.microsoft import sync
+from crm_microsoft_integration.microsoft.integration import config
+from crm_microsoft_integration.microsoft.integration import utils as integration_utils
 from crm_microsoft_integration.microsoft.integration.calendar import calendar
+from crm_microsoft_integration.microsoft.integration.subscription import subscription
+from crm_microsoft_integration.microsoft.doctype.microsoft_settings import (
+    microsoft_settings as mi_settings,
+)
 
 SYNC_MS_CALENDAR_TIMEOUT = 25 * 60
 SYNC_MS_CALENDAR_JOB_NAME = "sync_outlook_calendars"
@@ -34,63 +43,172 @@ class OutlookCalendar(Document):
 
 @frappe.whitelist()
 def sync_outlook_calendars():
-    frappe.enqueue(
-        _sync_outlook_calendars,
-        queue="default",
-        timeout=SYNC_MS_CALENDAR_TIMEOUT,
-        job_name=SYNC_MS_CALENDAR_JOB_NAME,
+    return sync.enqueue_sync(
+        SYNC_MS_CALENDAR_JOB_NAME,
+        f"{__name__}._sync_outlook_calendars",
+        SYNC_MS_CALENDAR_PROGRESS_ID,
+        "Outlook Calendars syncing started in background.",
+        SYNC_MS_CALENDAR_TIMEOUT,
+        sharded=True,
     )
-    return {
-        "status": "success",
-        "msg": "Outlook Calendars syncing started in background.",
-        "track_on": SYNC_MS_CALENDAR_PROGRESS_ID,
-    }
 
 
 def _sync_outlook_calendars():
-    ms_users = frappe.db.get_list("Microsoft User", ["name"])
+    # Splits the sync into shards of users run in parallel on the sync queue
+    ms_users = frappe.db.get_list("Microsoft User", ["name"], order_by="name asc")
     user_ids = [ms_user.name for ms_user in ms_users]
 
-    user_calendars = calendar.get_users_calendars(user_ids)
-    total_calendar_users = len(user_calendars)
+    sync.enqueue_shards(
+        SYNC_MS_CALENDAR_JOB_NAME,
+        f"{__name__}._sync_users_calendars",
+        {
+            users[0]: {"users": users}
+            for users in utils.create_batch(user_ids, sync.get_shard_size())
+        },
+        SYNC_MS_CALENDAR_PROGRESS_ID,
+        "Syncing Outlook Calendars",
+        lock_name=SYNC_MS_CALENDAR_JOB_NAME,
+    )
 
-    for idx, user in enumerate(user_calendars):
-        frappe.publish_realtime(
-            SYNC_MS_CALENDAR_PROGRESS_ID,
-            {
-                "progress": idx + 1,
-                "total": total_calendar_users,
-                "title": "Syncing Outlook Calendars",
-            },
-        )
 
+def _sync_users_calendars(users, checkpoint=None):
+    committer = sync.ChunkCommitter(checkpoint)
+
+    # Users up to the checkpoint were synced before the shard was interrupted
+    last_user = checkpoint.get("last_user") if checkpoint else None
+    if last_user:
+        users = [user for user in users if user > last_user]
+
+    user_calendars = calendar.get_users_calendars(users)
+    synced_calendars = 0
+
+    for user in user_calendars:
         for ol_calendar in user_calendars[user]:
-            existing_calendar = frappe.db.exists(
-                "Outlook Calendar", {"id": ol_calendar["id"]}
-            )
+            _sync_outlook_calendar(user, ol_calendar)
+
+        synced_calendars += len(user_calendars[user])
+        committer.add(len(user_calendars[user]) or 1, last_user=user)
 
-            if existing_calendar:
-                calendar_doc = frappe.get_doc("Outlook Calendar", existing_calendar)
-                has_updated = False
-
-                for fieldname, new_value in ol_calendar.items():
-                    old_value = calendar_doc.get(fieldname)
-
-                    if old_value != new_value:
-                        calendar_doc.set(fieldname, new_value)
-                        has_updated = True
-
-                if has_updated:
-                    calendar_doc.save()
-            else:
-                frappe.get_doc(
-                    {
-                        "doctype": "Outlook Calendar",
-                        "enable": 1,
-                        "pull_from_outlook_calendar": 1,
-                        "push_to_outlook_calendar": 1,
-                        "microsoft_user": user,
-                        **ol_calendar,
-                    }
-                ).save()
+    committer.commit()
+    return {"calendars": synced_calendars}
+
+
+def _sync_outlook_calendar(user, ol_calendar):
+    existing_calendar = frappe.db.exists("Outlook Calendar", {"id": ol_calendar["id"]})
+
+    if existing_calendar:
+        calendar_doc = frappe.get_doc("Outlook Calendar", existing_calendar)
+        has_updated = False
+
+        for fieldname, new_value in ol_calendar.items():
+            old_value = calendar_doc.get(fieldname)
+
+            if old_value != new_value:
+                calendar_doc.set(fieldname, new_value)
+                has_updated = True
+
+        if has_updated:
+            calendar_doc.save()
+    else:
+        frappe.get_doc(
+            {
+                "doctype": "Outlook Calendar",
+                "enable": 1,
+                "pull_from_outlook_calendar": 1,
+                "push_to_outlook_calendar": 1,
+                "microsoft_user": user,
+                **ol_calendar,
+            }
+        ).save()
+
+
+def sync_outlook_subscriptions():
+    if not frappe.db.get_single_value("Microsoft Settings", "enabled"):
+        return
+
+    client_state = mi_settings.get_notification_client_state(generate=True)
+    notification_url = integration_utils.get_notification_url()
+    expiry = utils.add_to_date(
+        utils.now_datetime(), minutes=config.SUBSCRIPTION_EXPIRY_MINUTES
+    )
+    renew_before = utils.add_to_date(
+        utils.now_datetime(), minutes=config.SUBSCRIPTION_RENEW_BEFORE_MINUTES
+    )
+
+    outlook_calendars = frappe.db.get_all(
+        "Outlook Calendar",
+        fields=[
+            "name",
+            "id",
+            "enable",
+            "pull_from_outlook_calendar",
+            "microsoft_user",
+            "subscription_id",
+            "subscription_expiry",
+        ],
+    )
+    for outlook_calendar in outlook_calendars:
+        try:
+            sync_outlook_calendar_subscription(
+                outlook_calendar, client_state, notification_url, expiry, renew_before
+            )
+        except HTTPError:
+            frappe.log_error(
+                f"Outlook Calendar subscription failed: {outlook_calendar.name}"
+            )
     frappe.db.commit()
+
+
+def sync_outlook_calendar_subscription(
+    outlook_calendar, client_state, notification_url, expiry, renew_before
+):
+    should_subscribe = (
+        outlook_calendar.enable
+        and outlook_calendar.pull_from_outlook_calendar
+        and outlook_calendar.microsoft_user
+    )
+
+    if not should_subscribe:
+        if outlook_calendar.subscription_id:
+            subscription.unsubscribe(outlook_calendar.subscription_id)
+            set_subscription(outlook_calendar.name, None, None)
+        return
+
+    if outlook_calendar.subscription_id:
+        if (
+            outlook_calendar.subscription_expiry
+            and utils.get_datetime(outlook_calendar.subscription_expiry) > renew_before
+        ):
+            return
+
+        try:
+            subscription_details = subscription.renew_subscription(
+                outlook_calendar.subscription_id, expiry
+            )
+            set_subscription(outlook_calendar.name, **subscription_details)
+            return
+        except HTTPError as e:
+            if e.response.status_code != 404:
+                raise e
+            # Subscription already expired, create a new one
+
+    subscription_details = subscription.subscribe_calendar_events(
+        outlook_calendar.microsoft_user,
+        outlook_calendar.id,
+        notification_url,
+        client_state,
+        expiry,
+    )
+    set_subscription(outlook_calendar.name, **subscription_details)
+
+
+def set_subscription(calendar_name, subscription_id, subscription_expiry):
+    frappe.db.set_value(
+        "Outlook Calendar",
+        calendar_name,
+        {
+            "subscription_id": subscription_id,
+            "subscription_expiry": subscription_expiry,
+        },
+        update_modified=False,
+    )
@@ -17,7 +17,7 @@ function addSyncOutlookCalendarBtn(listview) {
         "crm_microsoft_integration.microsoft.doctype.outlook_calendar.outlook_calendar.sync_outlook_calendars",
       callback: function (response) {
         if (response && response.message) {
-          if (response.message.status === "success") {
+          if (["success", "running"].includes(response.message.status)) {
             frappe.show_alert(
               response.message.msg || "Outlook Calendar syncing started.",
               5,
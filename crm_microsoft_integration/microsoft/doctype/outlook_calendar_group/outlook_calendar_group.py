@@ -3,6 +3,8 @@
 
 import frappe
 from frappe.model.document import Document
+from crm_microsoft_integration.microsoft import sync
+from crm_microsoft_integration.microsoft.integration import client
 from crm_microsoft_integration.microsoft.integration.calendar import calendar
 
 SYNC_MS_CALENDAR_GROUP_TIMEOUT = 25 * 60
@@ -16,20 +18,18 @@ class OutlookCalendarGroup(Document):
 
 @frappe.whitelist()
 def sync_outlook_calendar_groups():
-    frappe.enqueue(
-        _sync_outlook_calendar_groups,
-        queue="default",
-        timeout=SYNC_MS_CALENDAR_GROUP_TIMEOUT,
-        job_name=SYNC_MS_CALENDAR_GROUP_JOB_NAME,
+    return sync.enqueue_sync(
+        SYNC_MS_CALENDAR_GROUP_JOB_NAME,
+        f"{__name__}._sync_outlook_calendar_groups",
+        SYNC_MS_CALENDAR_GROUP_PROGRESS_ID,
+        "Outlook Calendars syncing started in background.",
+        SYNC_MS_CALENDAR_GROUP_TIMEOUT,
     )
-    return {
-        "status": "success",
-        "msg": "Outlook Calendars syncing started in background.",
-        "track_on": SYNC_MS_CALENDAR_GROUP_PROGRESS_ID,
-    }
 
 
 def _sync_outlook_calendar_groups():
+    client.reset_retry_stats()
+
     ms_users = frappe.db.get_list("Microsoft User", ["name"])
     user_ids = [ms_user.name for ms_user in ms_users]
 
@@ -43,48 +43,80 @@ def _sync_outlook_calendar_groups():
                 "progress": idx + 1,
                 "total": total_cal_group_users,
                 "title": "Syncing Outlook Calendar Groups",
+                "retry_stats": client.get_retry_stats(),
             },
         )
 
-        for user_cal_group in user_cal_groups[user]:
-            group_calendars = user_cal_group.pop("calendars")
-            cal_group_name = frappe.db.exists(
-                "Outlook Calendar Group", {"id": user_cal_group["id"]}
-            )
-
-            if cal_group_name:
-                cal_group_doc = frappe.get_doc("Outlook Calendar Group", cal_group_name)
-                has_updated = False
-
-                for fieldname, new_value in user_cal_group.items():
-                    old_value = cal_group_doc.get(fieldname)
-
-                    if old_value != new_value:
-                        cal_group_doc.set(fieldname, new_value)
-                        has_updated = True
-
-                if has_updated:
-                    cal_group_doc.save()
-            else:
-                cal_group = frappe.get_doc(
-                    {
-                        "doctype": "Outlook Calendar Group",
-                        **user_cal_group,
-                    }
-                ).save()
-                cal_group_name = cal_group.get("name")
-
-            for group_calendar in group_calendars:
-                existing_calendar = frappe.db.exists(
-                    "Outlook Calendar",
-                    {"id": group_calendar["id"], "calendar_group": cal_group_name},
-                )
-                if not existing_calendar:
-                    frappe.db.set_value(
-                        "Outlook Calendar",
-                        {"id": group_calendar["id"]},
-                        "calendar_group",
-                        cal_group_name,
-                    )
+        _sync_user_calendar_groups(user_cal_groups[user])
 
     frappe.db.commit()
+
+
+def _sync_user_calendar_groups(user_cal_groups):
+    cal_group_names = _sync_calendar_groups(user_cal_groups)
+
+    # Outlook Calendars are linked to their groups with one bulk update per user
+    group_calendars = {
+        group_calendar["id"]: cal_group_names[user_cal_group["id"]]
+        for user_cal_group in user_cal_groups
+        for group_calendar in user_cal_group["calendars"]
+    }
+    if not group_calendars:
+        return
+
+    calendar_updates = {
+        outlook_calendar.name: {"calendar_group": group_calendars[outlook_calendar.id]}
+        for outlook_calendar in frappe.get_all(
+            "Outlook Calendar",
+            {"id": ["in", list(group_calendars)]},
+            ["name", "id", "calendar_group"],
+        )
+        if outlook_calendar.calendar_group != group_calendars[outlook_calendar.id]
+    }
+    if calendar_updates:
+        frappe.db.bulk_update("Outlook Calendar", calendar_updates)
+
+
+def _sync_calendar_groups(user_cal_groups):
+    # Returns the names of the synced groups by their Outlook id
+    if not user_cal_groups:
+        return {}
+
+    existing_cal_groups = {
+        cal_group.id: cal_group
+        for cal_group in frappe.get_all(
+            "Outlook Calendar Group",
+            {"id": ["in", [cal_group["id"] for cal_group in user_cal_groups]]},
+            ["name", "id", "group_name", "class_id", "change_key"],
+        )
+    }
+
+    cal_group_names = {}
+    cal_group_updates = {}
+    for user_cal_group in user_cal_groups:
+        cal_group = {
+            fieldname: value
+            for fieldname, value in user_cal_group.items()
+            if fieldname != "calendars"
+        }
+        existing_cal_group = existing_cal_groups.get(cal_group["id"])
+
+        if existing_cal_group:
+            updates = {
+                fieldname: new_value
+                for fieldname, new_value in cal_group.items()
+                if existing_cal_group.get(fieldname) != new_value
+            }
+            if updates:
+                cal_group_updates[existing_cal_group.name] = updates
+            cal_group_names[cal_group["id"]] = existing_cal_group.name
+        else:
+            cal_group_doc = frappe.get_doc(
+                {"doctype": "Outlook Calendar Group", **cal_group}
+            ).insert()
+            cal_group_names[cal_group["id"]] = cal_group_doc.name
+
+    if cal_group_updates:
+        frappe.db.bulk_update("Outlook Calendar Group", cal_group_updates)
+
+    return cal_group_names
@@ -17,7 +17,7 @@ function addSyncOutlookCalGroupBtn(listview) {
         "crm_microsoft_integration.microsoft.doctype.outlook_calendar_group.outlook_calendar_group.sync_outlook_calendar_groups",
       callback: function (response) {
         if (response && response.message) {
-          if (response.message.status === "success") {
+          if (["success", "running"].includes(response.message.status)) {
             frappe.show_alert(
               response.message.msg ||
                 "Outlook Calendar Groups syncing started.",
@@ -1,8 +1,14 @@
+import time
 import frappe
 
+from frappe import utils as f_utils
 from frappe.utils import get_url_to_list
+from redis.exceptions import LockError
 from crm_microsoft_integration.microsoft.integration import utils, config, service
 
+# Access tokens kept in-process per site, backed by the shared Redis cache
+_access_tokens = {}
+
 
 @frappe.whitelist(allow_guest=True)
 def permit(tenant, state, admin_consent):
@@ -16,10 +22,52 @@ def permit(tenant, state, admin_consent):
 
 def get_access_token(generate=False):
     if not generate:
-        access_token = service.get_last_access_token()
+        access_token = get_cached_access_token()
         if access_token:
-            return access_token
+            if time.time() < access_token["refresh_at"]:
+                return access_token["access_token"]
+
+            # Close to expiry, only the worker holding the lock refreshes it early.
+            # The cached token is still valid, so a failed refresh does not fail a call.
+            try:
+                return (
+                    refresh_access_token(blocking=False)
+                    or access_token["access_token"]
+                )
+            except Exception:
+                frappe.log_error("Microsoft access token early refresh failed")
+                return access_token["access_token"]
+
+    return refresh_access_token(force=generate)
+
+
+def refresh_access_token(force=False, blocking=True):
+    lock = frappe.cache.lock(
+        frappe.cache.make_key(config.ACCESS_TOKEN_LOCK_KEY),
+        timeout=config.ACCESS_TOKEN_LOCK_TIMEOUT,
+        blocking_timeout=config.ACCESS_TOKEN_LOCK_TIMEOUT,
+    )
+    if not lock.acquire(blocking=blocking):
+        if blocking:
+            frappe.throw("Timed out waiting for the Microsoft access token refresh.")
+        return None
 
+    try:
+        if not force:
+            # Another worker may have refreshed it while waiting for the lock
+            access_token = get_cached_access_token(use_local=False)
+            if access_token and time.time() < access_token["refresh_at"]:
+                return access_token["access_token"]
+
+        return generate_access_token()
+    finally:
+        try:
+            lock.release()
+        except LockError:
+            pass
+
+
+def generate_access_token():
     client_credentials = service.get_client_credentials()
     payload = {
         "client_id": client_credentials["client_id"],
@@ -39,4 +87,53 @@ def get_access_token(generate=False):
         data["token_type"], data["access_token"], data["expires_in"]
     )
 
-    return f"{data['token_type']} {data['access_token']}"
+    access_token = f"{data['token_type']} {data['access_token']}"
+    set_cached_access_token(
+        access_token, data["expires_in"] - config.ACCESS_TOKEN_EXPIRY_BUFFER
+    )
+    return access_token
+
+
+def get_cached_access_token(use_local=True):
+    now = time.time()
+
+    access_token = _access_tokens.get(frappe.local.site) if use_local else None
+    if access_token and now < access_token["expires_at"]:
+        return access_token
+
+    access_token = frappe.cache.get_value(config.ACCESS_TOKEN_CACHE_KEY)
+    if access_token and now < access_token["expires_at"]:
+        _access_tokens[frappe.local.site] = access_token
+        return access_token
+
+    # Fallback to the token persisted in Microsoft Settings, e.g. after a cache flush
+    last_access_token, access_token_expiry = service.get_last_access_token(
+        with_expiry=True
+    )
+    if last_access_token:
+        expires_in = (access_token_expiry - f_utils.now_datetime()).total_seconds()
+        return set_cached_access_token(last_access_token, expires_in)
+
+
+def set_cached_access_token(access_token, expires_in):
+    expires_in = int(expires_in)
+    if expires_in <= 0:
+        return None
+
+    now = time.time()
+    access_token = {
+        "access_token": access_token,
+        "expires_at": now + expires_in,
+        "refresh_at": now + max(expires_in - config.ACCESS_TOKEN_REFRESH_BEFORE, 0),
+    }
+    frappe.cache.set_value(
+        config.ACCESS_TOKEN_CACHE_KEY, access_token, expires_in_sec=expires_in
+    )
+    _access_tokens[frappe.local.site] = access_token
+
+    return access_token
+
+
+def clear_access_token_cache():
+    _access_tokens.pop(frappe.local.site, None)
+    frappe.cache.delete_value(config.ACCESS_TOKEN_CACHE_KEY)
@@ -0,0 +1,213 @@
+from requests.exceptions import HTTPError
+from crm_microsoft_integration.microsoft.integration import (
+    utils,
+    config,
+    client,
+    concurrency,
+    retry,
+)
+
+
+class BatchResponse:
+    def __init__(
+        self, request_id, status_code, headers=None, body=None, request_headers=None
+    ):
+        self.request_id = request_id
+        self.status_code = status_code
+        self.headers = headers or {}
+        self.body = body
+        # Sent again with the `@odata.nextLink` requests of the answered page
+        self.request_headers = request_headers
+
+    @property
+    def ok(self):
+        return self.status_code < 400
+
+    def json(self):
+        return self.body
+
+    def raise_for_status(self):
+        if not self.ok:
+            raise HTTPError(
+                f"{self.status_code} Error for batch request: {self.request_id}",
+                response=self,
+            )
+
+
+def make_batch_request(
+    batch_requests, headers=None, max_workers=None, mailbox_limiter=None
+):
+    # batch_requests: {key: {"method": ..., "url": ..., "body": ..., "headers": ...,
+    # "mailbox": ...}}
+    # Returns {key: BatchResponse} in the order of `batch_requests`.
+    if not batch_requests:
+        return {}
+
+    keys = list(batch_requests)
+    chunk_size = config.GRAPH_BATCH_MAX_REQUESTS
+    chunks = [
+        {
+            key: batch_requests[key]
+            for key in keys[chunk_start : chunk_start + chunk_size]
+        }
+        for chunk_start in range(0, len(keys), chunk_size)
+    ]
+
+    # Auth headers & the client are resolved here as the chunks may be sent from
+    # worker threads which don't have the site context.
+    client.get_client()
+    headers = utils.prepare_headers(headers)
+
+    chunk_responses = concurrency.run_concurrently(
+        [
+            (
+                [batch_request.get("mailbox") for batch_request in chunk.values()],
+                send_batch,
+                (chunk, headers, False),
+            )
+            for chunk in chunks
+        ],
+        max_workers=max_workers,
+        mailbox_limiter=mailbox_limiter,
+    )
+
+    batch_responses = {}
+    for responses in chunk_responses:
+        batch_responses.update(responses)
+    return batch_responses
+
+
+def send_batch(batch_requests, headers=None, auth=True):
+    batch_responses = post_batch(batch_requests, headers, auth)
+    graph_client = client.get_client()
+
+    # Throttled sub-requests are replayed on their own, the rest are kept as is
+    attempt = 0
+    while True:
+        retry_keys = [
+            key
+            for key, batch_res in batch_responses.items()
+            if graph_client.retry_policy.is_retryable(
+                batch_requests[key].get("method", "GET"),
+                attempt,
+                batch_res.status_code,
+            )
+        ]
+        if not retry_keys:
+            return batch_responses
+
+        retry_afters = [
+            retry_after
+            for retry_after in (
+                retry.get_retry_after(batch_responses[key].headers)
+                for key in retry_keys
+            )
+            if retry_after is not None
+        ]
+        if not graph_client.retry_policy.wait(
+            graph_client.retry_stats,
+            attempt,
+            max(retry_afters) if retry_afters else None,
+            throttled=True,
+        ):
+            return batch_responses
+
+        batch_responses.update(
+            post_batch(
+                {key: batch_requests[key] for key in retry_keys}, headers, auth
+            )
+        )
+        attempt += 1
+
+
+def post_batch(batch_requests, headers=None, auth=True):
+    key_wise_ids = {}
+    payload_requests = []
+    for idx, (key, batch_request) in enumerate(batch_requests.items(), start=1):
+        request_id = str(idx)
+        key_wise_ids[key] = request_id
+        payload_requests.append(prepare_batch_request(request_id, batch_request))
+
+    batch_res = utils.make_request(
+        "POST",
+        config.GRAPH_BASE_URI,
+        config.GRAPH_BATCH_ENDPOINT,
+        auth=auth,
+        headers=headers,
+        json={"requests": payload_requests},
+        idempotent=all(
+            payload_request["method"] == "GET" for payload_request in payload_requests
+        ),
+    ).json()
+
+    id_wise_responses = {
+        item_res["id"]: item_res for item_res in (batch_res or {}).get("responses", [])
+    }
+
+    batch_responses = {}
+    for key, request_id in key_wise_ids.items():
+        item_res = id_wise_responses.get(request_id)
+        if not item_res:
+            # Graph always answers every id, treat a missing one as a gateway error
+            batch_responses[key] = BatchResponse(request_id, 502)
+            continue
+
+        batch_responses[key] = BatchResponse(
+            request_id,
+            int(item_res.get("status") or 502),
+            item_res.get("headers"),
+            item_res.get("body"),
+            batch_requests[key].get("headers"),
+        )
+
+    return batch_responses
+
+
+def prepare_batch_request(request_id, batch_request):
+    payload_request = {
+        "id": request_id,
+        "method": batch_request.get("method", "GET"),
+        "url": batch_request["url"],
+    }
+
+    if batch_request.get("body") is not None:
+        payload_request["body"] = batch_request["body"]
+        payload_request["headers"] = {
+            "Content-Type": "application/json",
+            **(batch_request.get("headers") or {}),
+        }
+    elif batch_request.get("headers"):
+        payload_request["headers"] = batch_request["headers"]
+
+    return payload_request
+
+
+def get_many(
+    endpoints, headers=None, max_workers=None, get_mailbox=None, request_headers=None
+):
+    # `headers` are sent with the batch itself, `request_headers` with every request
+    return make_batch_request(
+        {
+            key: {
+                "method": "GET",
+                "url": endpoint,
+                "headers": request_headers,
+                "mailbox": get_mailbox(key) if get_mailbox else None,
+            }
+            for key, endpoint in endpoints.items()
+        },
+        headers,
+        max_workers=max_workers,
+    )
+
+
+def iter_pages(batch_res):
+    # Yields the page answered in the batch followed by its `@odata.nextLink` pages
+    batch_res.raise_for_status()
+    return utils.iter_pages(
+        config.GRAPH_BASE_URI,
+        "",
+        # A copy, as the auth headers are added to the headers passed in
+        headers=dict(batch_res.request_headers or {}),
+        first_page=batch_res.json(),
+    )
@@ -1,16 +1,52 @@
 from crm_microsoft_integration.microsoft.integration import utils, config
+from crm_microsoft_integration.microsoft.integration.calendar import (
+    utils as calendar_utils,
+)
 
 ENDPOINT_BASE = "/users"
 
 
-def get_user_calendars(user_id, group_id=None):
-    return utils.make_get_request(
+def get_user_calendars(user_id, group_id=None, top=None):
+    return utils.collect_pages(iter_user_calendars(user_id, group_id, top))
+
+
+def iter_user_calendars(user_id, group_id=None, top=None):
+    return utils.iter_pages(
         config.GRAPH_BASE_URI,
+        get_user_calendars_endpoint(user_id, group_id, top or config.GRAPH_PAGE_SIZE),
+    )
+
+
+def get_user_calendars_endpoint(user_id, group_id=None, top=None):
+    return utils.add_query_params(
         f"{ENDPOINT_BASE}/{user_id}{f'/calendarGroups/{group_id}' if group_id else ''}/calendars",
+        {"$top": top, "$select": ",".join(calendar_utils.CALENDAR_SELECT_PROPERTIES)},
+    )
+
+
+def get_user_calendar_groups(user_id, top=None):
+    return utils.collect_pages(iter_user_calendar_groups(user_id, top))
+
+
+def iter_user_calendar_groups(user_id, top=None, expand_calendars=False):
+    return utils.iter_pages(
+        config.GRAPH_BASE_URI,
+        get_user_calendar_groups_endpoint(
+            user_id, top or config.GRAPH_PAGE_SIZE, expand_calendars
+        ),
     )
 
 
-def get_user_calendar_groups(user_id):
-    return utils.make_get_request(
-        config.GRAPH_BASE_URI, f"{ENDPOINT_BASE}/{user_id}/calendarGroups"
+def get_user_calendar_groups_endpoint(user_id, top=None, expand_calendars=False):
+    # Expanding the calendars returns each group with its calendars in one request
+    calendar_select = ",".join(calendar_utils.CALENDAR_SELECT_PROPERTIES)
+    return utils.add_query_params(
+        f"{ENDPOINT_BASE}/{user_id}/calendarGroups",
+        {
+            "$top": top,
+            "$select": ",".join(calendar_utils.CALENDAR_GROUP_SELECT_PROPERTIES),
+            "$expand": (
+                f"calendars($select={calendar_select})" if expand_calendars else None
+            ),
+        },
     )
@@ -1,45 +1,103 @@
 from requests.exceptions import HTTPError
+from crm_microsoft_integration.microsoft.integration import batch, config
+from crm_microsoft_integration.microsoft.integration import utils as integration_utils
 from crm_microsoft_integration.microsoft.integration.calendar import api, utils
 
 
-def get_users_calendars(users):
+def get_users_calendars(users, max_workers=None, top=None):
+    calendars_responses = batch.get_many(
+        {
+            user: api.get_user_calendars_endpoint(
+                user, top=top or config.GRAPH_PAGE_SIZE
+            )
+            for user in users
+        },
+        max_workers=max_workers,
+        get_mailbox=get_user_mailbox,
+    )
+
     user_wise_calendars = {}
     for user in users:
         try:
-            user_wise_calendars[user] = get_user_calendars(user)
+            user_wise_calendars[user] = parse_calendar_pages(
+                batch.iter_pages(calendars_responses[user])
+            )
         except HTTPError as e:
             if e.response.status_code == 404:
                 user_wise_calendars[user] = []
     return user_wise_calendars
 
 
-def get_user_calendars(user):
-    calendars_res = api.get_user_calendars(user)
-    return utils.parse_calendar_res(calendars_res)
+def get_user_mailbox(key):
+    # Keys are either the user or a (user, calendar group) pair
+    return key[0] if isinstance(key, tuple) else key
+
 
+def get_user_calendars(user, top=None):
+    return parse_calendar_pages(api.iter_user_calendars(user, top=top))
+
+
+def get_users_calendar_groups(users, with_calendar=False, max_workers=None, top=None):
+    calendar_groups_responses = batch.get_many(
+        {
+            user: api.get_user_calendar_groups_endpoint(
+                user, top or config.GRAPH_PAGE_SIZE, expand_calendars=with_calendar
+            )
+            for user in users
+        },
+        max_workers=max_workers,
+        get_mailbox=get_user_mailbox,
+    )
 
-def get_users_calendar_groups(users, with_calendar=False):
     user_wise_calendar_groups = {}
     for user in users:
         try:
-            user_wise_calendar_groups[user] = get_user_calendar_groups(
-                user, with_calendar
+            user_wise_calendar_groups[user] = parse_calendar_group_pages(
+                batch.iter_pages(calendar_groups_responses[user]), with_calendar
             )
         except HTTPError as e:
             if e.response.status_code == 404:
                 user_wise_calendar_groups[user] = []
+
     return user_wise_calendar_groups
 
 
-def get_user_calendar_groups(user, with_calendar=False):
-    calendar_group_res = api.get_user_calendar_groups(user)
-    calendar_groups = utils.parse_calendar_groups_res(calendar_group_res)
+def get_user_calendar_groups(user, with_calendar=False, top=None):
+    return parse_calendar_group_pages(
+        api.iter_user_calendar_groups(user, top, expand_calendars=with_calendar),
+        with_calendar,
+    )
+
+
+def parse_calendar_pages(calendar_pages, group_id=None):
+    return [
+        calendar
+        for calendar_page in calendar_pages
+        for calendar in utils.parse_calendar_res(calendar_page, group_id)
+    ]
+
+
+def parse_calendar_group_pages(calendar_group_pages, with_calendar=False):
+    calendar_groups = [
+        calendar_group
+        for calendar_group_page in calendar_group_pages
+        for calendar_group in utils.parse_calendar_groups_res(
+            calendar_group_page, with_calendar
+        )
+    ]
 
     if with_calendar:
+        # Rarely needed, only for groups with more calendars than one expansion holds
         for calendar_group in calendar_groups:
-            calendars_res = api.get_user_calendars(user, calendar_group["id"])
-            calendar_group["calendars"] = utils.parse_calendar_res(
-                calendars_res, calendar_group["id"]
-            )
+            calendars_next_link = calendar_group.pop("calendars_next_link")
+            if calendars_next_link:
+                calendar_group["calendars"].extend(
+                    parse_calendar_pages(
+                        integration_utils.iter_pages(
+                            config.GRAPH_BASE_URI, "", url=calendars_next_link
+                        ),
+                        calendar_group["id"],
+                    )
+                )
 
     return calendar_groups
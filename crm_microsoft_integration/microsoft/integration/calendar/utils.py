@@ -1,3 +1,16 @@
+# Properties read by the parsers below, the rest aren't requested
+CALENDAR_SELECT_PROPERTIES = (
+    "id",
+    "name",
+    "changeKey",
+    "hexColor",
+    "groupClassId",
+    "isDefaultCalendar",
+    "owner",
+)
+CALENDAR_GROUP_SELECT_PROPERTIES = ("id", "name", "classId", "changeKey")
+
+
 def parse_calendar_res(calendar_res, group_id=None):
     parsed_calendars = []
 
@@ -19,16 +32,24 @@ def parse_calendar_res(calendar_res, group_id=None):
     return parsed_calendars
 
 
-def parse_calendar_groups_res(calendar_group_res):
+def parse_calendar_groups_res(calendar_group_res, with_calendar=False):
     parsed_calendar_groups = []
 
     for calendar_group in calendar_group_res["value"]:
-        parsed_calendar_groups.append(
-            {
-                "id": calendar_group["id"],
-                "group_name": calendar_group["name"],
-                "class_id": calendar_group["classId"],
-                "change_key": calendar_group["changeKey"],
-            }
-        )
+        parsed_calendar_group = {
+            "id": calendar_group["id"],
+            "group_name": calendar_group["name"],
+            "class_id": calendar_group["classId"],
+            "change_key": calendar_group["changeKey"],
+        }
+        if with_calendar:
+            # Expanded `calendars`, a link is left for the ones that didn't fit
+            parsed_calendar_group["calendars"] = parse_calendar_res(
+                {"value": calendar_group.get("calendars") or []},
+                calendar_group["id"],
+            )
+            parsed_calendar_group["calendars_next_link"] = calendar_group.get(
+                "calendars@odata.nextLink"
+            )
+        parsed_calendar_groups.append(parsed_calendar_group)
     return parsed_calendar_groups
@@ -0,0 +1,121 @@
+import frappe
+import requests
+
+from requests.adapters import HTTPAdapter
+from crm_microsoft_integration.microsoft.integration import config, retry
+
+_client = None
+
+
+class GraphClient:
+    def __init__(
+        self,
+        pool_size=None,
+        timeout=None,
+        base_uri_overrides=None,
+        retry_policy=None,
+        retry_stats=None,
+    ):
+        if isinstance(timeout, list):
+            timeout = tuple(timeout)
+
+        self.pool_size = pool_size or config.HTTP_POOL_MAXSIZE
+        self.timeout = timeout or (
+            config.HTTP_CONNECT_TIMEOUT,
+            config.HTTP_READ_TIMEOUT,
+        )
+        self.base_uri_overrides = base_uri_overrides or {}
+        self.retry_policy = retry_policy or retry.RetryPolicy()
+        self.retry_stats = retry_stats or retry.RetryStats()
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=config.HTTP_POOL_CONNECTIONS,
+            pool_maxsize=self.pool_size,
+        )
+        # http:// is mounted as well so a local stand-in can be used for benchmarks
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def resolve_url(self, base_uri, endpoint="", url=None):
+        if url:
+            return url
+        return f"{self.base_uri_overrides.get(base_uri, base_uri)}{endpoint}"
+
+    def request(self, method, url, idempotent=None, **kwargs):
+        kwargs.setdefault("timeout", self.timeout)
+
+        attempt = 0
+        while True:
+            try:
+                res = self.session.request(method, url, **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                if not (
+                    self.retry_policy.is_retryable(
+                        method, attempt, idempotent=idempotent
+                    )
+                    and self.retry_policy.wait(self.retry_stats, attempt)
+                ):
+                    raise
+            else:
+                if not (
+                    self.retry_policy.is_retryable(
+                        method, attempt, res.status_code, idempotent
+                    )
+                    and self.retry_policy.wait(
+                        self.retry_stats,
+                        attempt,
+                        retry.get_retry_after(res.headers),
+                        throttled=True,
+                    )
+                ):
+                    return res
+            attempt += 1
+
+    def reset_retry_stats(self, max_retries=None, max_wait_seconds=None):
+        self.retry_stats = retry.RetryStats(max_retries, max_wait_seconds)
+        return self.retry_stats
+
+    def close(self):
+        self.session.close()
+
+
+def get_client():
+    global _client
+
+    if not _client:
+        _client = GraphClient(
+            pool_size=frappe.conf.get("microsoft_http_pool_size"),
+            timeout=frappe.conf.get("microsoft_http_timeout"),
+            base_uri_overrides=get_base_uri_overrides(),
+        )
+    return _client
+
+
+def set_client(client):
+    global _client
+
+    if _client and _client is not client:
+        _client.close()
+    _client = client
+
+
+def reset_client():
+    set_client(None)
+
+
+def reset_retry_stats(max_retries=None, max_wait_seconds=None):
+    return get_client().reset_retry_stats(max_retries, max_wait_seconds)
+
+
+def get_retry_stats():
+    return get_client().retry_stats.as_dict()
+
+
+def get_base_uri_overrides():
+    overrides = {}
+    if frappe.conf.get("microsoft_graph_base_uri"):
+        overrides[config.GRAPH_BASE_URI] = frappe.conf.microsoft_graph_base_uri
+    if frappe.conf.get("microsoft_auth_base_uri"):
+        overrides[config.MI_BASE_URI] = frappe.conf.microsoft_auth_base_uri
+    return overrides
@@ -0,0 +1,64 @@
+import frappe
+import threading
+
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from crm_microsoft_integration.microsoft.integration import config
+
+
+class MailboxLimiter:
+    def __init__(self, per_mailbox_limit=None):
+        self.per_mailbox_limit = (
+            per_mailbox_limit or config.GRAPH_MAX_REQUESTS_PER_MAILBOX
+        )
+        self._semaphores = {}
+        self._lock = threading.Lock()
+
+    def get_semaphore(self, mailbox):
+        with self._lock:
+            if mailbox not in self._semaphores:
+                self._semaphores[mailbox] = threading.BoundedSemaphore(
+                    self.per_mailbox_limit
+                )
+            return self._semaphores[mailbox]
+
+    @contextmanager
+    def acquire(self, mailboxes):
+        # Sorted acquisition keeps tasks sharing mailboxes from deadlocking
+        semaphores = [
+            self.get_semaphore(mailbox)
+            for mailbox in sorted({mailbox for mailbox in mailboxes if mailbox})
+        ]
+        for semaphore in semaphores:
+            semaphore.acquire()
+        try:
+            yield
+        finally:
+            for semaphore in reversed(semaphores):
+                semaphore.release()
+
+
+def get_max_workers(max_workers=None):
+    return (
+        max_workers
+        or frappe.conf.get("microsoft_graph_max_workers")
+        or config.GRAPH_MAX_WORKERS
+    )
+
+
+def run_concurrently(tasks, max_workers=None, mailbox_limiter=None):
+    # tasks: [(mailboxes, func, args)], results are returned in the order of tasks.
+    # Tasks run outside of the request/job context, so they must not touch frappe.local.
+    max_workers = get_max_workers(max_workers)
+    mailbox_limiter = mailbox_limiter or MailboxLimiter()
+
+    def run_task(mailboxes, func, args):
+        with mailbox_limiter.acquire(mailboxes):
+            return func(*args)
+
+    if max_workers <= 1 or len(tasks) <= 1:
+        return [run_task(*task) for task in tasks]
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(tasks))) as executor:
+        futures = [executor.submit(run_task, *task) for task in tasks]
+        return [future.result() for future in futures]
@@ -4,6 +4,7 @@
 APP_REDIRECT_ENDPOINT = (
     "/api/method/crm_microsoft_integration.microsoft.integration.auth.permit"
 )
+APP_NOTIFICATION_ENDPOINT = "/api/method/crm_microsoft_integration.microsoft.customizations.event.receive_outlook_notification"
 
 # Microsoft Config
 
@@ -20,8 +21,54 @@ MI_BASE_URI = "https://login.microsoftonline.com"
 MI_ADMIN_CONSENT_ENDPOINT = "/adminconsent"
 MI_ACESS_TOKEN_ENDPOINT = f"/oauth2/{AUTH_API_VERSION}/token"
 
+### Access Token Cache
+ACCESS_TOKEN_CACHE_KEY = "microsoft_access_token"
+ACCESS_TOKEN_LOCK_KEY = "microsoft_access_token_refresh_lock"
+ACCESS_TOKEN_EXPIRY_BUFFER = 300  # Seconds, token is treated as expired this early
+ACCESS_TOKEN_REFRESH_BEFORE = 600  # Seconds before expiry to refresh proactively
+ACCESS_TOKEN_LOCK_TIMEOUT = 30
+
 ## Graph Config
 GRAPH_API_VERSION = "v1.0"
 
 ### URIs
 GRAPH_BASE_URI = f"https://graph.microsoft.com/{GRAPH_API_VERSION}"
+
+## HTTP Client Config
+# Overridable per site via `microsoft_http_pool_size` and `microsoft_http_timeout`
+HTTP_POOL_CONNECTIONS = 4
+HTTP_POOL_MAXSIZE = 16
+HTTP_CONNECT_TIMEOUT = 10
+HTTP_READ_TIMEOUT = 60
+
+### Endpoints
+GRAPH_BATCH_ENDPOINT = "/$batch"
+
+## Batch Config
+GRAPH_BATCH_MAX_REQUESTS = 20  # Hard limit of Graph JSON batching
+
+## Retry Config
+RETRY_STATUS_CODES = (429, 503, 504)
+# Verbs that can be safely replayed after a server/network failure,
+# throttled (429) requests are never processed and are retried for every verb.
+RETRY_IDEMPOTENT_METHODS = ("GET", "HEAD", "OPTIONS", "PUT", "PATCH", "DELETE")
+RETRY_MAX_ATTEMPTS = 5
+RETRY_BACKOFF_BASE = 1  # seconds
+RETRY_BACKOFF_MAX = 60  # seconds
+
+### Per job budget
+RETRY_BUDGET_RETRIES = 500
+RETRY_BUDGET_SECONDS = 10 * 60
+
+## Concurrency Config
+# Overridable per site via `microsoft_graph_max_workers`
+GRAPH_MAX_WORKERS = 4
+GRAPH_MAX_REQUESTS_PER_MAILBOX = 4  # Graph allows 4 concurrent requests per mailbox
+
+## Pagination Config
+GRAPH_PAGE_SIZE = 100  # Default `$top` of list endpoints
+GRAPH_USERS_PAGE_SIZE = 300
+
+## Change Notification Config
+SUBSCRIPTION_EXPIRY_MINUTES = 4230  # Graph allows up to 10080 for events
+SUBSCRIPTION_RENEW_BEFORE_MINUTES = 24 * 60
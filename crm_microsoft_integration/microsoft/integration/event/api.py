@@ -1,11 +1,58 @@
 import frappe
+from frappe import utils as f_utils
 from crm_microsoft_integration.microsoft.integration import utils, config
+from crm_microsoft_integration.microsoft.integration.event import (
+    utils as event_utils,
+)
 
 ENDPOINT_BASE = "/users"
 EVENTS_ENDPOINT = "/events"
+CALENDAR_VIEW_ENDPOINT = "/calendarView"
+CALENDAR_VIEW_DELTA_ENDPOINT = "/calendarView/delta"
 
 
-def get_user_events(user_id, calendar_events=False, calendar_id=None, group_id=None):
+def get_event_headers(*preferences):
+    # Graph converts the event times to the system timezone before sending them
+    return {
+        "Content-Type": "application/json",
+        "Prefer": ", ".join(
+            (f'outlook.timezone="{f_utils.get_system_timezone()}"', *preferences)
+        ),
+    }
+
+
+def get_user_events(
+    user_id, calendar_events=False, calendar_id=None, group_id=None, top=None
+):
+    return utils.collect_pages(
+        iter_user_events(user_id, calendar_events, calendar_id, group_id, top)
+    )
+
+
+def iter_user_events(
+    user_id, calendar_events=False, calendar_id=None, group_id=None, top=None
+):
+    return utils.iter_pages(
+        config.GRAPH_BASE_URI,
+        get_user_events_endpoint(
+            user_id,
+            calendar_events,
+            calendar_id,
+            group_id,
+            top or config.GRAPH_PAGE_SIZE,
+        ),
+        headers=get_event_headers(),
+    )
+
+
+def get_user_events_endpoint(
+    user_id,
+    calendar_events=False,
+    calendar_id=None,
+    group_id=None,
+    top=None,
+    with_body=True,
+):
     if group_id and not calendar_id:
         frappe.throw("Calendar ID is needed with Group ID")
 
@@ -16,9 +63,92 @@ def get_user_events(user_id, calendar_events=False, calendar_id=None, group_id=N
             + f"{f'/calendarGroups/{group_id}' if group_id else ''}/calendar{f's/{calendar_id}' if calendar_id else ''}"
         )
 
-    events_endpoint = events_endpoint + EVENTS_ENDPOINT
+    return utils.add_query_params(
+        events_endpoint + EVENTS_ENDPOINT,
+        {"$top": top, "$select": event_utils.get_event_select(with_body)},
+    )
 
-    return utils.make_get_request(config.GRAPH_BASE_URI, events_endpoint)
+
+def get_user_event(user_id, event_id, select=None):
+    return utils.make_get_request(
+        config.GRAPH_BASE_URI,
+        get_user_event_endpoint(user_id, event_id, select),
+        headers=get_event_headers(),
+    )
+
+
+def get_user_event_endpoint(user_id, event_id, select=None):
+    return utils.add_query_params(
+        f"{ENDPOINT_BASE}/{user_id}{EVENTS_ENDPOINT}/{event_id}",
+        {"$select": select or event_utils.get_event_select()},
+    )
+
+
+def iter_user_calendar_view(
+    user_id,
+    calendar_id=None,
+    start=None,
+    end=None,
+    page_link=None,
+    top=None,
+    with_body=True,
+):
+    headers = get_event_headers()
+
+    if page_link:
+        return utils.iter_pages(
+            config.GRAPH_BASE_URI, "", headers=headers, url=page_link, prefetch=True
+        )
+
+    return utils.iter_pages(
+        config.GRAPH_BASE_URI,
+        get_user_calendar_view_endpoint(user_id, calendar_id),
+        params={
+            "startDateTime": start,
+            "endDateTime": end,
+            "$select": event_utils.get_event_select(with_body),
+        },
+        headers=headers,
+        top=top or config.GRAPH_PAGE_SIZE,
+        prefetch=True,
+    )
+
+
+def get_user_calendar_view_endpoint(user_id, calendar_id=None):
+    return (
+        f"{ENDPOINT_BASE}/{user_id}/calendar{f's/{calendar_id}' if calendar_id else ''}"
+        + CALENDAR_VIEW_ENDPOINT
+    )
+
+
+def iter_user_calendar_view_delta(
+    user_id, calendar_id=None, start=None, end=None, delta_link=None, page_size=None
+):
+    # `$top` & `$select` aren't supported by delta queries, the page size is
+    # requested instead.
+    headers = get_event_headers(
+        f"odata.maxpagesize={page_size or config.GRAPH_PAGE_SIZE}"
+    )
+
+    if delta_link:
+        return utils.iter_pages(
+            config.GRAPH_BASE_URI, "", headers=headers, url=delta_link, prefetch=True
+        )
+
+    return utils.iter_pages(
+        config.GRAPH_BASE_URI,
+        get_user_calendar_view_delta_endpoint(user_id, calendar_id),
+        params={"startDateTime": start, "endDateTime": end},
+        headers=headers,
+        prefetch=True,
+    )
+
+
+def get_user_calendar_view_delta_endpoint(user_id, calendar_id=None):
+    return (
+        f"{ENDPOINT_BASE}/{user_id}/calendar{f's/{calendar_id}' if calendar_id else ''}"
+        + CALENDAR_VIEW_DELTA_ENDPOINT
+    )
 
 
 def create_user_event(event, user_id, calendar_events=False, calendar_id=None):
@@ -28,7 +158,9 @@ def create_user_event(event, user_id, calendar_events=False, calendar_id=None):
 
     events_endpoint += EVENTS_ENDPOINT
 
-    return utils.make_post_request(config.GRAPH_BASE_URI, events_endpoint, json=event)
+    return utils.make_post_request(
+        config.GRAPH_BASE_URI, events_endpoint, headers=get_event_headers(), json=event
+    )
 
 
 def update_user_event(
@@ -40,7 +172,9 @@ def update_user_event(
 
     events_endpoint += EVENTS_ENDPOINT + f"/{event['id']}"
 
-    return utils.make_patch_request(config.GRAPH_BASE_URI, events_endpoint, json=event)
+    return utils.make_patch_request(
+        config.GRAPH_BASE_URI, events_endpoint, headers=get_event_headers(), json=event
+    )
 
 
 def delete_user_event(
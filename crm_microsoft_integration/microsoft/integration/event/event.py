@@ -1,29 +1,151 @@
 from requests.exceptions import HTTPError
+from crm_microsoft_integration.microsoft.integration import batch, config
 from crm_microsoft_integration.microsoft.integration.event import api, utils
 
 
-def get_users_events(users, calendar_events=False, calendar_id=None, group_id=None):
+def get_users_events(
+    users,
+    calendar_events=False,
+    calendar_id=None,
+    group_id=None,
+    max_workers=None,
+    top=None,
+    parse=True,
+    with_body=True,
+):
+    events_responses = batch.get_many(
+        {
+            user: api.get_user_events_endpoint(
+                user,
+                calendar_events,
+                calendar_id,
+                group_id,
+                top or config.GRAPH_PAGE_SIZE,
+                with_body,
+            )
+            for user in users
+        },
+        max_workers=max_workers,
+        get_mailbox=get_user_mailbox,
+        request_headers=api.get_event_headers(),
+    )
+
     user_wise_events = {}
     for user in users:
         try:
-            user_wise_events[user] = get_user_events(
-                user, calendar_events, calendar_id, group_id
-            )
+            user_wise_events[user] = [
+                event
+                for events_page in batch.iter_pages(events_responses[user])
+                for event in (
+                    utils.parse_events_res(events_page)
+                    if parse
+                    else events_page["value"]
+                )
+            ]
         except HTTPError as e:
             if e.response.status_code == 404:
                 user_wise_events[user] = []
     return user_wise_events
 
 
-def get_user_events(user, calendar_events=False, calendar_id=None, group_id=None):
-    events_res = api.get_user_events(user, calendar_events, calendar_id, group_id)
-    return utils.parse_events_res(events_res)
+def get_user_mailbox(user):
+    return user
+
+
+def get_user_events(
+    user, calendar_events=False, calendar_id=None, group_id=None, top=None
+):
+    return list(iter_user_events(user, calendar_events, calendar_id, group_id, top))
+
+
+def iter_user_events(
+    user, calendar_events=False, calendar_id=None, group_id=None, top=None
+):
+    for events_page in api.iter_user_events(
+        user, calendar_events, calendar_id, group_id, top
+    ):
+        yield from utils.parse_events_res(events_page)
+
+
+def get_user_event(user, event_id, parse=True):
+    event_res = api.get_user_event(user, event_id)
+    return utils.parse_event_res(event_res) if parse else event_res
+
 
+def iter_user_calendar_view_events(
+    user,
+    calendar_id=None,
+    start=None,
+    end=None,
+    page_link=None,
+    parse=True,
+    with_body=True,
+):
+    # Yields (events, next_link) per page of the occurrences within start and end
+    for events_page in api.iter_user_calendar_view(
+        user,
+        calendar_id,
+        utils.format_datetime_to_utc_iso(start) if start else None,
+        utils.format_datetime_to_utc_iso(end) if end else None,
+        page_link,
+        with_body=with_body,
+    ):
+        yield (
+            utils.parse_events_res(events_page) if parse else events_page["value"],
+            events_page.get("@odata.nextLink"),
+        )
+
+
+def set_events_body(user, events_res, max_workers=None):
+    # Fetches the body of events listed without it, in one batch
+    body_responses = batch.get_many(
+        {
+            event_res["id"]: api.get_user_event_endpoint(user, event_res["id"], "body")
+            for event_res in events_res
+        },
+        max_workers=max_workers,
+        get_mailbox=lambda _event_id: user,
+    )
+
+    for event_res in events_res:
+        body_res = body_responses[event_res["id"]]
+        if body_res.status_code == 404:
+            # Removed since it was listed, the next sync drops it
+            event_res["body"] = {"content": None}
+            continue
+
+        body_res.raise_for_status()
+        event_res["body"] = body_res.json()["body"]
 
-def insert_cal_event(event_doc, orgainzer_user_doc, calendar_doc):
+
+def iter_user_calendar_events_delta(
+    user, calendar_id=None, start=None, end=None, delta_link=None, parse=True
+):
+    # Yields (events, removed_event_ids, next_link, delta_link) per page, `next_link`
+    # is present on all but the last page and `delta_link` only on the last one.
+    for events_page in api.iter_user_calendar_view_delta(
+        user,
+        calendar_id,
+        utils.format_datetime_to_utc_iso(start) if start else None,
+        utils.format_datetime_to_utc_iso(end) if end else None,
+        delta_link,
+    ):
+        events, removed_event_ids = utils.parse_delta_events_res(events_page, parse)
+        yield (
+            events,
+            removed_event_ids,
+            events_page.get("@odata.nextLink"),
+            events_page.get("@odata.deltaLink"),
+        )
+
+
+def insert_cal_event(event_doc, orgainzer_user_doc, calendar_doc, transaction_id=None):
     outlook_event, missing_email_participants = utils.outlook_event_from_event_doc(
         event_doc, orgainzer_user_doc, calendar_doc
     )
+    if transaction_id:
+        # Lets Outlook drop the duplicate if a retried create already went through
+        outlook_event["transactionId"] = transaction_id
     event_res = api.create_user_event(
         outlook_event, event_doc.custom_outlook_organiser, calendar_id=calendar_doc.id
     )
@@ -32,10 +154,22 @@ def insert_cal_event(event_doc, orgainzer_user_doc, calendar_doc):
     return event, missing_email_participants
 
 
-def update_cal_event(event_doc, orgainzer_user_doc, calendar_doc):
+def update_cal_event(event_doc, orgainzer_user_doc, calendar_doc, properties=None):
     outlook_event, missing_email_participants = utils.outlook_event_from_event_doc(
         event_doc, orgainzer_user_doc, calendar_doc
     )
+    if properties is not None:
+        if not properties:
+            return None, missing_email_participants
+
+        # Only the changed properties are patched, id is needed for the endpoint
+        outlook_event = {
+            "id": outlook_event["id"],
+            **{
+                outlook_property: outlook_event[outlook_property]
+                for outlook_property in properties
+            },
+        }
 
     event_res = api.update_user_event(
         outlook_event, event_doc.custom_outlook_organiser, calendar_id=calendar_doc.id
@@ -2,6 +2,46 @@ import pytz
 from frappe import utils
 
 
+# Event properties the CRM owns, the rest are read-only or set by Outlook
+OUTLOOK_EVENT_UPDATABLE_PROPERTIES = (
+    "subject",
+    "attendees",
+    "allowNewTimeProposals",
+    "body",
+    "start",
+    "end",
+    "isAllDay",
+    "isOnlineMeeting",
+    "onlineMeetingProvider",
+    "location",
+)
+
+# Event properties read by `parse_event_res`, the rest aren't requested
+OUTLOOK_EVENT_SELECT_PROPERTIES = (
+    "id",
+    "changeKey",
+    "iCalUId",
+    "subject",
+    "start",
+    "end",
+    "isAllDay",
+    "webLink",
+    "body",
+    "onlineMeeting",
+    "location",
+    "attendees",
+)
+
+
+def get_event_select(with_body=True):
+    # The body is the bulk of an event, it can be fetched once the event changed
+    return ",".join(
+        outlook_property
+        for outlook_property in OUTLOOK_EVENT_SELECT_PROPERTIES
+        if with_body or outlook_property != "body"
+    )
+
+
 def parse_events_res(events_res):
     parsed_events = []
 
@@ -10,6 +50,17 @@ def parse_events_res(events_res):
     return parsed_events
 
 
+def parse_delta_events_res(events_res, parse=True):
+    parsed_events, removed_event_ids = [], []
+
+    for event in events_res["value"]:
+        if "@removed" in event:
+            removed_event_ids.append(event["id"])
+        else:
+            parsed_events.append(parse_event_res(event) if parse else event)
+    return parsed_events, removed_event_ids
+
+
 def parse_event_res(event_res):
     event_participants = []
     for attendee in event_res["attendees"]:
@@ -90,6 +141,17 @@ def outlook_event_from_event_doc(event_doc, organizer_doc=None, calendar_doc=Non
     }, email_not_found
 
 
+def get_changed_outlook_properties(old_event_doc, event_doc):
+    old_outlook_event, _email_not_found = outlook_event_from_event_doc(old_event_doc)
+    outlook_event, _email_not_found = outlook_event_from_event_doc(event_doc)
+
+    return [
+        outlook_property
+        for outlook_property in OUTLOOK_EVENT_UPDATABLE_PROPERTIES
+        if old_outlook_event[outlook_property] != outlook_event[outlook_property]
+    ]
+
+
 def get_outlook_attendees_from_event(event_doc):
     attendees, email_not_found = [], []
 
@@ -149,6 +211,10 @@ def parse_outlook_date_object(datetime_obj):
     if not datetime_tz:
         raise ValueError("Missing 'timeZone' in input object")
 
+    # Already converted by Graph when requested with the system timezone
+    if datetime_tz == utils.get_system_timezone():
+        return utils.get_datetime(iso_datetime_str)
+
     parsed_datetime = pytz.timezone(datetime_tz).localize(
         utils.get_datetime(iso_datetime_str)
     )
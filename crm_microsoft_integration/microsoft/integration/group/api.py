@@ -1,13 +1,56 @@
 from crm_microsoft_integration.microsoft.integration import utils, config
+from crm_microsoft_integration.microsoft.integration.group import utils as group_utils
 
 ENDPOINT_BASE = "/groups"
+DELTA_ENDPOINT = "/delta"
 
 
-def get_groups():
-    return utils.make_get_request(config.GRAPH_BASE_URI, ENDPOINT_BASE)
+def get_groups(top=None):
+    return utils.collect_pages(iter_groups(top))
 
 
-def get_group_members(group_id):
-    return utils.make_get_request(
-        config.GRAPH_BASE_URI, f"{ENDPOINT_BASE}/{group_id}/members"
+def iter_groups(top=None):
+    return utils.iter_pages(
+        config.GRAPH_BASE_URI,
+        ENDPOINT_BASE,
+        params={"$select": ",".join(group_utils.GROUP_SELECT_PROPERTIES)},
+        top=top or config.GRAPH_PAGE_SIZE,
+    )
+
+
+def get_group_members(group_id, top=None):
+    return utils.collect_pages(iter_group_members(group_id, top))
+
+
+def iter_group_members(group_id, top=None):
+    return utils.iter_pages(
+        config.GRAPH_BASE_URI,
+        get_group_members_endpoint(group_id, top or config.GRAPH_PAGE_SIZE),
+    )
+
+
+def get_group_members_endpoint(group_id, top=None):
+    return utils.add_query_params(
+        f"{ENDPOINT_BASE}/{group_id}/members",
+        {
+            "$top": top,
+            "$select": ",".join(group_utils.GROUP_MEMBER_SELECT_PROPERTIES),
+        },
+    )
+
+
+def iter_groups_delta(url=None, page_size=None):
+    return utils.iter_pages(
+        config.GRAPH_BASE_URI,
+        ENDPOINT_BASE + DELTA_ENDPOINT,
+        params=(
+            None
+            if url
+            else {"$select": ",".join(group_utils.GROUP_DELTA_SELECT_PROPERTIES)}
+        ),
+        headers={
+            "Content-Type": "application/json",
+            "Prefer": f"odata.maxpagesize={page_size or config.GRAPH_PAGE_SIZE}",
+        },
+        url=url,
     )
@@ -1,13 +1,44 @@
+from crm_microsoft_integration.microsoft.integration import batch, config
 from crm_microsoft_integration.microsoft.integration.group import api, utils
 
 
-def get_groups(with_users=False):
-    group_res = api.get_groups()
-    groups = utils.parse_groups_res(group_res)
+def get_groups(with_users=False, top=None):
+    groups = [
+        group
+        for groups_page in api.iter_groups(top)
+        for group in utils.parse_groups_res(groups_page)
+    ]
 
     if with_users:
+        members_responses = batch.get_many(
+            {
+                group["id"]: api.get_group_members_endpoint(
+                    group["id"], top or config.GRAPH_PAGE_SIZE
+                )
+                for group in groups
+            }
+        )
         for group in groups:
-            members_res = api.get_group_members(group["id"])
-            group["users"] = utils.parse_group_members_res(members_res, group["id"])
+            group["users"] = [
+                member
+                for members_page in batch.iter_pages(members_responses[group["id"]])
+                for member in utils.parse_group_members_res(members_page, group["id"])
+            ]
 
     return groups
+
+
+def iter_group_members(group_id, top=None):
+    for members_page in api.iter_group_members(group_id, top):
+        yield from utils.parse_group_members_res(members_page, group_id)
+
+
+def iter_groups_delta(url=None):
+    # Yields (groups, removed_group_ids, added_members, removed_members, next_link,
+    # delta_link) per page, members are (user_id, group_id) pairs.
+    for groups_page in api.iter_groups_delta(url):
+        yield (
+            *utils.parse_delta_groups_res(groups_page),
+            groups_page.get("@odata.nextLink"),
+            groups_page.get("@odata.deltaLink"),
+        )
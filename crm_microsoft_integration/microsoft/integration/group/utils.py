@@ -1,3 +1,11 @@
+USER_ODATA_TYPE = "#microsoft.graph.user"
+
+# Properties read by the parsers below, the rest aren't requested
+GROUP_SELECT_PROPERTIES = ("id", "displayName", "mail")
+GROUP_DELTA_SELECT_PROPERTIES = (*GROUP_SELECT_PROPERTIES, "members")
+GROUP_MEMBER_SELECT_PROPERTIES = ("id", "userPrincipalName", "displayName", "mail")
+
+
 def parse_groups_res(groups_res):
     parsed_groups = []
 
@@ -26,3 +34,40 @@ def parse_group_members_res(members_res, group_id):
             }
         )
     return parsed_members
+
+
+def parse_delta_groups_res(groups_res):
+    # Membership changes come as `members@delta`, a group can show up on more than
+    # one page with a part of its members each time.
+    parsed_groups = []
+    removed_group_ids = []
+    added_members = []
+    removed_members = []
+
+    for group in groups_res["value"]:
+        if "@removed" in group:
+            removed_group_ids.append(group["id"])
+            continue
+
+        group_fields = {
+            fieldname: group[property]
+            for fieldname, property in (
+                ("id", "id"),
+                ("display_name", "displayName"),
+                ("mail", "mail"),
+            )
+            if property in group
+        }
+        if len(group_fields) > 1:
+            parsed_groups.append(group_fields)
+
+        for member in group.get("members@delta") or []:
+            if member.get("@odata.type", USER_ODATA_TYPE) != USER_ODATA_TYPE:
+                continue
+
+            if "@removed" in member:
+                removed_members.append((member["id"], group["id"]))
+            else:
+                added_members.append((member["id"], group["id"]))
+
+    return parsed_groups, removed_group_ids, added_members, removed_members
@@ -0,0 +1,117 @@
+import random
+import threading
+import time
+
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from crm_microsoft_integration.microsoft.integration import config
+
+
+class RetryStats:
+    def __init__(self, max_retries=None, max_wait_seconds=None):
+        self.max_retries = (
+            config.RETRY_BUDGET_RETRIES if max_retries is None else max_retries
+        )
+        self.max_wait_seconds = (
+            config.RETRY_BUDGET_SECONDS
+            if max_wait_seconds is None
+            else max_wait_seconds
+        )
+        self.retries = 0
+        self.throttled = 0
+        self.throttled_seconds = 0.0
+        self.exhausted = False
+        self._lock = threading.Lock()
+
+    def reserve(self, wait_seconds, throttled=False):
+        with self._lock:
+            if (
+                self.retries + 1 > self.max_retries
+                or self.throttled_seconds + wait_seconds > self.max_wait_seconds
+            ):
+                self.exhausted = True
+                return False
+
+            self.retries += 1
+            self.throttled_seconds += wait_seconds
+            if throttled:
+                self.throttled += 1
+            return True
+
+    def as_dict(self):
+        return {
+            "retries": self.retries,
+            "throttled": self.throttled,
+            "throttled_seconds": round(self.throttled_seconds, 2),
+            "budget_exhausted": self.exhausted,
+        }
+
+
+class RetryPolicy:
+    def __init__(
+        self,
+        max_attempts=None,
+        backoff_base=None,
+        backoff_max=None,
+        status_codes=None,
+        idempotent_methods=None,
+    ):
+        self.max_attempts = max_attempts or config.RETRY_MAX_ATTEMPTS
+        self.backoff_base = backoff_base or config.RETRY_BACKOFF_BASE
+        self.backoff_max = backoff_max or config.RETRY_BACKOFF_MAX
+        self.status_codes = status_codes or config.RETRY_STATUS_CODES
+        self.idempotent_methods = (
+            idempotent_methods or config.RETRY_IDEMPOTENT_METHODS
+        )
+
+    def is_retryable(self, method, attempt, status_code=None, idempotent=None):
+        if attempt >= self.max_attempts:
+            return False
+
+        if status_code == 429:
+            return True
+
+        if status_code is not None and status_code not in self.status_codes:
+            return False
+
+        if idempotent is None:
+            idempotent = method.upper() in self.idempotent_methods
+        return idempotent
+
+    def get_wait_seconds(self, attempt, retry_after=None):
+        if retry_after is not None:
+            return retry_after
+
+        # Full jitter exponential backoff
+        return random.uniform(
+            0, min(self.backoff_max, self.backoff_base * (2**attempt))
+        )
+
+    def wait(self, stats, attempt, retry_after=None, throttled=False):
+        wait_seconds = self.get_wait_seconds(attempt, retry_after)
+        if not stats.reserve(wait_seconds, throttled):
+            return False
+
+        time.sleep(wait_seconds)
+        return True
+
+
+def get_retry_after(headers):
+    headers = headers or {}
+    retry_after = headers.get("Retry-After") or headers.get("retry-after")
+    if not retry_after:
+        return None
+
+    try:
+        return max(float(retry_after), 0)
+    except ValueError:
+        pass
+
+    try:
+        retry_at = parsedate_to_datetime(retry_after)
+    except (TypeError, ValueError):
+        return None
+
+    if not retry_at.tzinfo:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max((retry_at - datetime.now(timezone.utc)).total_seconds(), 0)
@@ -7,8 +7,8 @@ def verify_consent_permit(tenant, consent_id, admin_consent):
     return mi_settings.verify_consent_permit(tenant, consent_id, admin_consent)
 
 
-def get_last_access_token():
-    return mi_settings.get_access_token()
+def get_last_access_token(with_expiry=False):
+    return mi_settings.get_access_token(with_expiry)
 
 
 def set_access_token(token_type, access_token, expires_in):
@@ -0,0 +1,21 @@
+from crm_microsoft_integration.microsoft.integration import utils, config
+
+ENDPOINT_BASE = "/subscriptions"
+
+
+def create_subscription(subscription):
+    return utils.make_post_request(
+        config.GRAPH_BASE_URI, ENDPOINT_BASE, json=subscription
+    )
+
+
+def update_subscription(subscription_id, subscription):
+    return utils.make_patch_request(
+        config.GRAPH_BASE_URI, f"{ENDPOINT_BASE}/{subscription_id}", json=subscription
+    )
+
+
+def delete_subscription(subscription_id):
+    return utils.make_delete_request(
+        config.GRAPH_BASE_URI, f"{ENDPOINT_BASE}/{subscription_id}"
+    )
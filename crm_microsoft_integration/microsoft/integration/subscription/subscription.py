@@ -0,0 +1,36 @@
+from requests.exceptions import HTTPError
+from crm_microsoft_integration.microsoft.integration.subscription import api, utils
+
+
+def subscribe_calendar_events(
+    user_id, calendar_id, notification_url, client_state, expiry
+):
+    subscription_res = api.create_subscription(
+        {
+            "changeType": "created,updated,deleted",
+            "notificationUrl": notification_url,
+            "resource": f"/users/{user_id}/calendars/{calendar_id}/events",
+            "expirationDateTime": utils.format_expiry(expiry),
+            "clientState": client_state,
+        }
+    )
+    return utils.parse_subscription_res(subscription_res)
+
+
+def renew_subscription(subscription_id, expiry):
+    subscription_res = api.update_subscription(
+        subscription_id, {"expirationDateTime": utils.format_expiry(expiry)}
+    )
+    return utils.parse_subscription_res(subscription_res)
+
+
+def unsubscribe(subscription_id):
+    try:
+        api.delete_subscription(subscription_id)
+        return "success"
+    except HTTPError as e:
+        if e.response.status_code == 404:
+            # Subscription already expired or deleted
+            return "Subscription not found"
+        else:
+            raise e
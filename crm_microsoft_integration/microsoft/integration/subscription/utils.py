@@ -0,0 +1,14 @@
+from crm_microsoft_integration.microsoft.integration.event import utils as event_utils
+
+
+def parse_subscription_res(subscription_res):
+    return {
+        "subscription_id": subscription_res["id"],
+        "subscription_expiry": event_utils.parse_outlook_date(
+            subscription_res["expirationDateTime"]
+        ),
+    }
+
+
+def format_expiry(expiry):
+    return event_utils.format_datetime_to_utc_iso(expiry)
@@ -1,24 +1,37 @@
 from crm_microsoft_integration.microsoft.integration import utils, config
+from crm_microsoft_integration.microsoft.integration.user import utils as user_utils
 
 ENDPOINT_BASE = "/users"
+DELTA_ENDPOINT = "/delta"
 
 
-def get_users():
-    users = []
-    next_url = None
-    while True:
-        users_res = {}
-        if not next_url:
-            users_res = utils.make_get_request(
-                config.GRAPH_BASE_URI, f"{ENDPOINT_BASE}?$orderby=displayName&$top=300"
-            )
-        else:
-            users_res = utils.make_get_request("", "", url=next_url)
+def get_users(top=None):
+    return utils.collect_pages(iter_users(top))
 
-        users.extend(users_res["value"])
 
-        if users_res.get("@odata.nextLink"):
-            next_url = users_res["@odata.nextLink"]
-        else:
-            return {**users_res, "value": users}
-    return users
+def iter_users(top=None):
+    return utils.iter_pages(
+        config.GRAPH_BASE_URI,
+        ENDPOINT_BASE,
+        params={
+            "$orderby": "displayName",
+            "$select": ",".join(user_utils.USER_SELECT_PROPERTIES),
+        },
+        top=top or config.GRAPH_USERS_PAGE_SIZE,
+    )
+
+
+def iter_users_delta(url=None, page_size=None):
+    # `url` is a next/delta link of an earlier round, without it a new round starts
+    return utils.iter_pages(
+        config.GRAPH_BASE_URI,
+        ENDPOINT_BASE + DELTA_ENDPOINT,
+        params=(
+            None if url else {"$select": ",".join(user_utils.USER_SELECT_PROPERTIES)}
+        ),
+        headers={
+            "Content-Type": "application/json",
+            "Prefer": f"odata.maxpagesize={page_size or config.GRAPH_USERS_PAGE_SIZE}",
+        },
+        url=url,
+    )
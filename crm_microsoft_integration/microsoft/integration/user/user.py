@@ -1,6 +1,23 @@
 from crm_microsoft_integration.microsoft.integration.user import api, utils
 
 
-def get_users():
-    users_res = api.get_users()
-    return utils.parse_user_res(users_res)
+def get_users(top=None):
+    return list(iter_users(top))
+
+
+def iter_users(top=None):
+    for users_page in api.iter_users(top):
+        yield from utils.parse_user_res(users_page)
+
+
+def iter_users_delta(url=None):
+    # Yields (users, removed_user_ids, next_link, delta_link) per page, `delta_link`
+    # is only present on the last page of a round.
+    for users_page in api.iter_users_delta(url):
+        users, removed_user_ids = utils.parse_delta_users_res(users_page)
+        yield (
+            users,
+            removed_user_ids,
+            users_page.get("@odata.nextLink"),
+            users_page.get("@odata.deltaLink"),
+        )
@@ -1,3 +1,7 @@
+# Properties read by the parsers below, the rest aren't requested
+USER_SELECT_PROPERTIES = ("id", "displayName", "mail", "userPrincipalName")
+
+
 def parse_user_res(users_res):
     parsed_users = []
 
@@ -11,3 +15,28 @@ def parse_user_res(users_res):
             }
         )
     return parsed_users
+
+
+def parse_delta_users_res(users_res):
+    # Changed users only carry their changed properties, the rest are left out
+    parsed_users = []
+    removed_user_ids = []
+
+    for user in users_res["value"]:
+        if "@removed" in user:
+            removed_user_ids.append(user["id"])
+            continue
+
+        parsed_users.append(
+            {
+                fieldname: user[property]
+                for fieldname, property in (
+                    ("display_name", "displayName"),
+                    ("mail", "mail"),
+                    ("principal_name", "userPrincipalName"),
+                    ("id", "id"),
+                )
+                if property in user
+            }
+        )
+    return parsed_users, removed_user_ids
@@ -1,8 +1,9 @@
 import frappe
-import requests
 
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode
 from frappe import utils
-from crm_microsoft_integration.microsoft.integration import config, auth
+from crm_microsoft_integration.microsoft.integration import config, auth, client
 
 
 def get_auth_headers():
@@ -17,16 +18,38 @@ def prepare_headers(headers=None, auth=True):
     return headers
 
 
-def make_get_request(
-    base_uri, endpoint, auth=True, params=None, headers=None, url=None
+def make_request(
+    method,
+    base_uri,
+    endpoint,
+    auth=True,
+    headers=None,
+    url=None,
+    idempotent=None,
+    **kwargs,
 ):
     headers = prepare_headers(headers, auth)
+    graph_client = client.get_client()
 
-    res = requests.get(
-        f"{url if url else base_uri + endpoint}", params=params, headers=headers
+    res = graph_client.request(
+        method,
+        graph_client.resolve_url(base_uri, endpoint, url),
+        headers=headers,
+        idempotent=idempotent,
+        **kwargs,
     )
     res.raise_for_status()
 
+    return res
+
+
+def make_get_request(
+    base_uri, endpoint, auth=True, params=None, headers=None, url=None
+):
+    res = make_request(
+        "GET", base_uri, endpoint, auth=auth, headers=headers, url=url, params=params
+    )
+
     if res.text:
         return res.json()
 
@@ -34,16 +57,16 @@ def make_get_request(
 def make_post_request(
     base_uri, endpoint, auth=True, headers=None, params=None, data=None, json=None
 ):
-    headers = prepare_headers(headers, auth)
-
-    res = requests.post(
-        f"{base_uri}{endpoint}",
+    res = make_request(
+        "POST",
+        base_uri,
+        endpoint,
+        auth=auth,
         headers=headers,
         params=params,
         data=data,
         json=json,
     )
-    res.raise_for_status()
 
     if res.text:
         return res.json()
@@ -52,16 +75,16 @@ def make_post_request(
 def make_patch_request(
     base_uri, endpoint, auth=True, headers=None, params=None, data=None, json=None
 ):
-    headers = prepare_headers(headers, auth)
-
-    res = requests.patch(
-        f"{base_uri}{endpoint}",
+    res = make_request(
+        "PATCH",
+        base_uri,
+        endpoint,
+        auth=auth,
         headers=headers,
         params=params,
         data=data,
         json=json,
     )
-    res.raise_for_status()
 
     if res.text:
         return res.json()
@@ -70,25 +93,129 @@ def make_patch_request(
 def make_delete_request(
     base_uri, endpoint, auth=True, headers=None, params=None, data=None, json=None
 ):
-    headers = prepare_headers(headers, auth)
-
-    res = requests.delete(
-        f"{base_uri}{endpoint}",
+    res = make_request(
+        "DELETE",
+        base_uri,
+        endpoint,
+        auth=auth,
         headers=headers,
         params=params,
         data=data,
         json=json,
     )
-    res.raise_for_status()
 
     if res.text:
         return res
 
 
+def iter_pages(
+    base_uri,
+    endpoint,
+    auth=True,
+    params=None,
+    headers=None,
+    top=None,
+    first_page=None,
+    url=None,
+    prefetch=False,
+):
+    if top:
+        params = {**(params or {}), "$top": top}
+
+    if prefetch and first_page is None:
+        yield from iter_prefetched_pages(
+            base_uri, endpoint, auth=auth, params=params, headers=headers, url=url
+        )
+        return
+
+    page = first_page
+    if page is None:
+        page = make_get_request(
+            base_uri, endpoint, auth=auth, params=params, headers=headers, url=url
+        )
+
+    while page:
+        yield page
+
+        next_link = page.get("@odata.nextLink")
+        if not next_link:
+            break
+        page = make_get_request(
+            base_uri, endpoint, auth=auth, headers=headers, url=next_link
+        )
+
+
+def iter_prefetched_pages(
+    base_uri, endpoint, auth=True, params=None, headers=None, url=None
+):
+    # Fetches the next page in the background while the caller consumes the current
+    # one, the next request is only sent once the caller asks for the next page so
+    # at most one page is held in memory ahead of the consumer.
+    graph_client = client.get_client()
+
+    def fetch_page(page_url, page_params, page_headers):
+        res = graph_client.request(
+            "GET",
+            graph_client.resolve_url(base_uri, endpoint, page_url),
+            headers=page_headers,
+            params=page_params,
+        )
+        res.raise_for_status()
+        if res.text:
+            return res.json()
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        # Headers are resolved here as the auth token lives in the site context
+        next_page = executor.submit(
+            fetch_page, url, params, prepare_headers(dict(headers or {}), auth)
+        )
+        while next_page:
+            page = next_page.result()
+            if not page:
+                break
+
+            next_link = page.get("@odata.nextLink")
+            next_page = (
+                executor.submit(
+                    fetch_page,
+                    next_link,
+                    None,
+                    prepare_headers(dict(headers or {}), auth),
+                )
+                if next_link
+                else None
+            )
+            yield page
+
+
+def collect_pages(pages):
+    last_page = {}
+    values = []
+    for page in pages:
+        values.extend(page.get("value") or [])
+        last_page = page
+    return {**last_page, "value": values}
+
+
+def add_query_params(endpoint, params=None):
+    params = {key: value for key, value in (params or {}).items() if value}
+    if not params:
+        return endpoint
+    return f"{endpoint}{'&' if '?' in endpoint else '?'}{urlencode(params, safe='$,')}"
+
+
 def get_redirect_uri():
     return f"{utils.get_url()}{config.APP_REDIRECT_ENDPOINT}"
 
 
+def get_notification_url():
+    # Overridable to point Graph (or a local stand-in) at a tunnel/other host
+    return (
+        frappe.conf.get("microsoft_notification_url")
+        or f"{utils.get_url()}{config.APP_NOTIFICATION_ENDPOINT}"
+    )
+
+
 def get_consent_uri(client_id, state, tenant_id=None):
     if not client_id:
         frappe.throw("Client Id is required.")
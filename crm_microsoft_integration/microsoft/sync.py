@@ -0,0 +1,401 @@
+import json
+import frappe
+from frappe import utils
+from crm_microsoft_integration.microsoft.integration import client
+
+# Records synced per transaction, overridable with `microsoft_sync_chunk_size`
+SYNC_CHUNK_SIZE = 100
+# Checkpoints older than this are from an abandoned run and are not resumed
+SYNC_CHECKPOINT_MAX_AGE_HOURS = 24
+SYNC_CHECKPOINT_KEY = "microsoft_sync_checkpoint::{0}"
+
+# Shards are run on this queue, overridable with `microsoft_sync_queue`
+SYNC_QUEUE = "long"
+# Users per shard, overridable with `microsoft_sync_shard_size`
+SYNC_SHARD_SIZE = 25
+SYNC_SHARD_TIMEOUT = 25 * 60
+SYNC_RUN_KEY = "microsoft_sync_run::{0}"
+
+# Held for the whole run of a sync, expires in case the run dies without releasing
+SYNC_LOCK_KEY = "microsoft_sync_lock::{0}"
+SYNC_LOCK_TIMEOUT = 4 * 60 * 60
+SYNC_LAST_RUN_KEY = "microsoft_sync_last_run::{0}"
+
+
+@frappe.whitelist()
+def get_sync_status(lock_name):
+    frappe.only_for("System Manager")
+
+    return {
+        "running": is_sync_running(lock_name),
+        "last_run": get_last_run(lock_name),
+    }
+
+
+@frappe.whitelist()
+def release_sync_locks():
+    # Frees the syncs of a run that died without releasing its lock before it expires
+    frappe.only_for("System Manager")
+
+    lock_keys = frappe.cache.get_keys(SYNC_LOCK_KEY.format(""))
+    if lock_keys:
+        pipeline = frappe.cache.pipeline()
+        pipeline.delete(*lock_keys)
+        pipeline.execute()
+    return len(lock_keys)
+
+
+def enqueue_sync(lock_name, method, progress_id, msg, timeout, sharded=False, **kwargs):
+    # Points to the progress of a running sync instead of starting a duplicate
+    if is_sync_running(lock_name):
+        return {
+            "status": "running",
+            "msg": "Syncing is already in progress.",
+            "track_on": progress_id,
+            "last_run": get_last_run(lock_name),
+        }
+
+    # The job id drops duplicates that are queued but have not taken the lock yet
+    frappe.enqueue(
+        run_sync,
+        queue="default",
+        timeout=timeout,
+        job_id=lock_name,
+        deduplicate=True,
+        lock_name=lock_name,
+        method=method,
+        sharded=sharded,
+        **kwargs,
+    )
+    return {"status": "success", "msg": msg, "track_on": progress_id}
+
+
+def run_sync(lock_name, method, sharded=False, **kwargs):
+    if not acquire_sync_lock(lock_name):
+        return
+
+    started_on = utils.now()
+    try:
+        stats = frappe.get_attr(method)(**kwargs)
+    except Exception:
+        release_sync_lock(lock_name)
+        set_last_run(lock_name, "Failed", started_on)
+        raise
+
+    # Sharded syncs hold the lock until the last shard finishes
+    if not sharded:
+        release_sync_lock(lock_name)
+        set_last_run(lock_name, "Success", started_on, stats)
+
+
+def acquire_sync_lock(lock_name):
+    # Pipelines run plain Redis commands, unlike the pickling cache wrappers
+    pipeline = frappe.cache.pipeline()
+    pipeline.set(
+        frappe.cache.make_key(SYNC_LOCK_KEY.format(lock_name)),
+        utils.now(),
+        nx=True,
+        ex=SYNC_LOCK_TIMEOUT,
+    )
+    return bool(pipeline.execute()[0])
+
+
+def release_sync_lock(lock_name):
+    pipeline = frappe.cache.pipeline()
+    pipeline.delete(frappe.cache.make_key(SYNC_LOCK_KEY.format(lock_name)))
+    pipeline.execute()
+
+
+def is_sync_running(lock_name):
+    pipeline = frappe.cache.pipeline()
+    pipeline.exists(frappe.cache.make_key(SYNC_LOCK_KEY.format(lock_name)))
+    return bool(pipeline.execute()[0])
+
+
+def get_last_run(lock_name):
+    last_run = frappe.db.get_global(SYNC_LAST_RUN_KEY.format(lock_name))
+    return json.loads(last_run) if last_run else None
+
+
+def set_last_run(lock_name, status, started_on, stats=None):
+    frappe.db.set_global(
+        SYNC_LAST_RUN_KEY.format(lock_name),
+        json.dumps(
+            {
+                "status": status,
+                "started_on": started_on,
+                "finished_on": utils.now(),
+                "stats": stats,
+            }
+        ),
+    )
+    frappe.db.commit()
+
+
+def set_standard_fields(doc, name, now):
+    doc.update(
+        {
+            "name": name,
+            "owner": frappe.session.user,
+            "creation": now,
+            "modified": now,
+            "modified_by": frappe.session.user,
+        }
+    )
+
+
+def bulk_insert_rows(doctype, rows):
+    if not rows:
+        return
+
+    fields = list(rows[0])
+    frappe.db.bulk_insert(
+        doctype, fields, [tuple(row.get(field) for field in fields) for row in rows]
+    )
+
+
+def get_chunk_size():
+    return utils.cint(frappe.conf.get("microsoft_sync_chunk_size")) or SYNC_CHUNK_SIZE
+
+
+def get_sync_queue():
+    return frappe.conf.get("microsoft_sync_queue") or SYNC_QUEUE
+
+
+def get_shard_size():
+    return utils.cint(frappe.conf.get("microsoft_sync_shard_size")) or SYNC_SHARD_SIZE
+
+
+# Progress of a sync job persisted with its data, so a re-run can resume
+class SyncCheckpoint:
+    def __init__(self, job_name):
+        self.key = SYNC_CHECKPOINT_KEY.format(job_name)
+        self.values = self.load()
+
+    def load(self):
+        checkpoint = frappe.db.get_global(self.key)
+        if not checkpoint:
+            return {}
+
+        checkpoint = json.loads(checkpoint)
+        max_age = utils.add_to_date(
+            utils.now_datetime(), hours=-SYNC_CHECKPOINT_MAX_AGE_HOURS
+        )
+        if utils.get_datetime(checkpoint.get("saved_on")) < max_age:
+            return {}
+        return checkpoint.get("values") or {}
+
+    def get(self, key, default=None):
+        return self.values.get(key, default)
+
+    def save(self, **values):
+        self.values.update(values)
+        frappe.db.set_global(
+            self.key,
+            json.dumps({"saved_on": utils.now(), "values": self.values}),
+        )
+
+    def clear(self):
+        self.values = {}
+        frappe.defaults.clear_default(self.key, parent="__global")
+
+
+# Commits every `chunk_size` synced records along with the checkpoint
+class ChunkCommitter:
+    def __init__(self, checkpoint=None, chunk_size=None):
+        self.checkpoint = checkpoint
+        self.chunk_size = chunk_size or get_chunk_size()
+        self.pending = 0
+
+    def add(self, count=1, **checkpoint_values):
+        self.pending += count
+        if self.pending >= self.chunk_size:
+            self.commit(**checkpoint_values)
+
+    def commit(self, **checkpoint_values):
+        if self.checkpoint is not None and checkpoint_values:
+            self.checkpoint.save(**checkpoint_values)
+        frappe.db.commit()
+        self.pending = 0
+
+    def finish(self):
+        if self.checkpoint is not None:
+            self.checkpoint.clear()
+        frappe.db.commit()
+        self.pending = 0
+
+
+# Shared state of a sharded sync run, kept in Redis as shards finish on other workers
+class SyncRun:
+    def __init__(self, job_name):
+        self.job_name = job_name
+        self.key = frappe.cache.make_key(SYNC_RUN_KEY.format(job_name))
+
+    def start(self, total, progress_id, title, finished=0, lock_name=None):
+        pipeline = frappe.cache.pipeline()
+        pipeline.delete(self.key)
+        pipeline.hset(
+            self.key,
+            mapping={
+                "total": total,
+                "finished": finished,
+                "failed": 0,
+                "progress_id": progress_id,
+                "title": title,
+                "lock_name": lock_name or "",
+                "started_on": utils.now(),
+            },
+        )
+        pipeline.expire(self.key, SYNC_CHECKPOINT_MAX_AGE_HOURS * 60 * 60)
+        pipeline.execute()
+
+    def get_state(self):
+        pipeline = frappe.cache.pipeline()
+        pipeline.hgetall(self.key)
+        state = pipeline.execute()[0]
+        if not state:
+            return None
+
+        state = frappe._dict(
+            {key.decode(): value.decode() for key, value in state.items()}
+        )
+        for key in state:
+            if key in ("total", "finished", "failed") or key.startswith("stats:"):
+                state[key] = utils.cint(state[key])
+        return state
+
+    def shard_finished(self, stats=None, failed=False):
+        pipeline = frappe.cache.pipeline()
+        for stat, count in (stats or {}).items():
+            pipeline.hincrby(self.key, f"stats:{stat}", count)
+        if failed:
+            pipeline.hincrby(self.key, "failed", 1)
+        pipeline.hincrby(self.key, "finished", 1)
+        finished = pipeline.execute()[-1]
+
+        state = self.get_state()
+        self.publish_progress(state)
+
+        # Only the shard completing the run sees `finished` reach the total
+        if state and finished == state.total:
+            self.finish(state)
+
+    def publish_progress(self, state):
+        if not state:
+            return
+
+        frappe.publish_realtime(
+            state.progress_id,
+            {
+                "progress": state.finished,
+                "total": state.total,
+                "title": state.title,
+                "failed": state.failed,
+                "sync_stats": get_stats(state),
+            },
+        )
+
+    def finish(self, state=None):
+        state = state or self.get_state()
+        self.publish_progress(state)
+
+        if state and state.lock_name:
+            set_last_run(
+                state.lock_name,
+                "Failed" if state.failed else "Success",
+                state.started_on,
+                {**get_stats(state), "shards": state.total, "failed": state.failed},
+            )
+            release_sync_lock(state.lock_name)
+
+        if state and state.failed:
+            # Failed shards, e.g. timed out ones, are resumed by the next run from their
+            # checkpoints with the same plan, only the finished shards start over
+            shard_plan = SyncCheckpoint(f"{self.job_name}::plan")
+            for shard_key in shard_plan.get("shards") or {}:
+                checkpoint = SyncCheckpoint(f"{self.job_name}::{shard_key}")
+                if checkpoint.get("done"):
+                    checkpoint.clear()
+        else:
+            # The run is complete, the next one plans its shards and starts over
+            frappe.db.delete(
+                "DefaultValue",
+                {
+                    "parent": "__global",
+                    "defkey": [
+                        "like",
+                        f"{SYNC_CHECKPOINT_KEY.format(self.job_name)}::%",
+                    ],
+                },
+            )
+            frappe.defaults.clear_cache("__global")
+        frappe.db.commit()
+
+
+def get_stats(state):
+    return {
+        key.removeprefix("stats:"): value
+        for key, value in state.items()
+        if key.startswith("stats:")
+    }
+
+
+def enqueue_shards(job_name, method, shards, progress_id, title, lock_name=None):
+    # `shards` maps a shard key to the kwargs of `method`. The shards of an earlier run
+    # that did not complete are resumed as planned then, so the keys still match their
+    # checkpoints, and the shards it finished are skipped.
+    shard_plan = SyncCheckpoint(f"{job_name}::plan")
+    if shard_plan.get("shards"):
+        shards = shard_plan.get("shards")
+    else:
+        shard_plan.save(shards=shards)
+        frappe.db.commit()
+
+    pending_shards = {
+        shard_key: shard_kwargs
+        for shard_key, shard_kwargs in shards.items()
+        if not SyncCheckpoint(f"{job_name}::{shard_key}").get("done")
+    }
+
+    sync_run = SyncRun(job_name)
+    sync_run.start(
+        len(shards),
+        progress_id,
+        title,
+        finished=len(shards) - len(pending_shards),
+        lock_name=lock_name,
+    )
+    if not pending_shards:
+        sync_run.finish()
+        return
+
+    for shard_key, shard_kwargs in pending_shards.items():
+        frappe.enqueue(
+            run_shard,
+            queue=get_sync_queue(),
+            timeout=SYNC_SHARD_TIMEOUT,
+            job_id=f"{job_name}::{shard_key}",
+            deduplicate=True,
+            job_name=job_name,
+            shard_key=shard_key,
+            method=method,
+            shard_kwargs=shard_kwargs,
+        )
+
+
+def run_shard(job_name, shard_key, method, shard_kwargs):
+    checkpoint = SyncCheckpoint(f"{job_name}::{shard_key}")
+
+    client.reset_retry_stats()
+    try:
+        stats = frappe.get_attr(method)(checkpoint=checkpoint, **shard_kwargs) or {}
+        retry_stats = client.get_retry_stats()
+        stats.update(retries=retry_stats["retries"], throttled=retry_stats["throttled"])
+        checkpoint.save(done=True)
+        frappe.db.commit()
+    except Exception:
+        frappe.db.rollback()
+        frappe.log_error(f"Microsoft sync shard failed: {job_name} {shard_key}")
+        SyncRun(job_name).shard_finished(failed=True)
+    else:
+        SyncRun(job_name).shard_finished(stats)
@@ -0,0 +1,22 @@
+import frappe
+from crm_microsoft_integration.config import custom_fields
+from crm_microsoft_integration.install import add_indexes
+
+
+def execute():
+    # Custom fields created before search_index was set are not updated on install
+    for custom_field in custom_fields.EVENT_CUSTOM_FIELDS:
+        if not custom_field.get("search_index"):
+            continue
+
+        custom_field_name = frappe.db.exists(
+            "Custom Field",
+            {"dt": custom_field["dt"], "fieldname": custom_field["fieldname"]},
+        )
+        if custom_field_name:
+            custom_field_doc = frappe.get_doc("Custom Field", custom_field_name)
+            if not custom_field_doc.search_index:
+                custom_field_doc.search_index = 1
+                custom_field_doc.save()
+
+    add_indexes()
@@ -17,7 +17,7 @@ function addSyncOutlookEventsBtn(listview) {
         "crm_microsoft_integration.microsoft.customizations.event.sync_outlook_events",
       callback: function (response) {
         if (response && response.message) {
-          if (response.message.status === "success") {
+          if (["success", "running"].includes(response.message.status)) {
             frappe.show_alert(
               response.message.msg || "Outlook Event syncing started.",
               5,